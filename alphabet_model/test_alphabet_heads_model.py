@@ -0,0 +1,45 @@
+import torch
+import sklearn.metrics
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import constants as c
+from utilities.data_processing import *
+from utilities.feature_store import open_features
+from models.checkpoint import load_model
+from models.predictor import predict_batched
+from training.one_vs_rest import head_metrics
+
+device = torch.device("cpu")
+
+# the multi-head model holds the one-vs-rest classifiers of every letter, trained with training/configs/alphabet_heads.json
+alphabet_heads_cnn = load_model(c.MODEL_SAVE_PATH + "/alphabet_heads_model.pt", device)
+alpha_key = alphabet_heads_cnn.class_map
+
+# the images go through the model in micro-batches whose activations fit in MEMORY_BUDGET bytes, see models/predictor.py
+MEMORY_BUDGET = 512 * 1024 ** 2
+
+''' returns the probability of every letter's one-vs-rest head for a batch of preprocessed images (n x 200 x 200), all
+the heads are scored in one forward pass.  input can be a memory mapped feature file, pass normalize=True to normalize
+its images a micro-batch at a time'''
+def predict_one_vs_rest(input, normalize=False):
+    logits = predict_batched(alphabet_heads_cnn, input, MEMORY_BUDGET, normalize=normalize)
+    return 1 / (1 + np.exp(-logits))
+
+# use this method to test the "A vs rest", "W vs rest", ... decision of every letter on a preprocessed dataset
+def test(alpha_X_test, alpha_y_test):
+    scores = predict_one_vs_rest(alpha_X_test.reshape(-1, 200, 200), normalize=True)
+    y = numeric_class(alpha_y_test)
+    accuracy, precision, recall = head_metrics(scores, y)
+    print('letter, accuracy, precision, recall')
+    for i in np.unique(y):
+        print(f"{alpha_key[i]}, {round(accuracy[i], 5)}, {round(precision[i], 5)}, {round(recall[i], 5)}")
+    # the most confident head is also a multi-class prediction
+    print(sklearn.metrics.accuracy_score(y, np.argmax(scores, axis=1)))
+
+alpha_X_test = open_features('alpha_test_inputs.npy')
+alpha_y_test = get_training_arr('alphabet_test_labels.npy')
+print(alpha_X_test.shape, alpha_y_test.shape)
+
+test(alpha_X_test, alpha_y_test)
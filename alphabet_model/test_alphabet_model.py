@@ -1,6 +1,4 @@
 import torch
-import torch.nn as nn
-import torch.nn.functional as F
 import sklearn.metrics
 import matplotlib.pyplot as plt
 import sys
@@ -9,6 +7,11 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 import constants as c
 from utilities.data_processing import *
+from utilities.feature_store import open_features
+from utilities.preprocess_cache import PreprocessCache
+from utilities.team_dataset import team_batches
+from models.checkpoint import load_model
+from models.predictor import predict_batched
 
 ''' check for GPU, if no GPU, use CPU '''
 if torch.cuda.is_available():
@@ -19,46 +22,27 @@ else:
     print("Running on the CPU")
 device = torch.device("cpu")
 
-# alphabet model
-class Net(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = nn.Conv2d(1, 16, kernel_size=5, stride=1, padding=3)
-        self.conv2 = nn.Conv2d(16, 24, kernel_size=5, stride=1, padding=3)
-        self.conv3 = nn.Conv2d(24, 32, kernel_size=5, stride=1, padding=2)
-        self.conv4 = nn.Conv2d(32, 64, kernel_size=5, stride=1, padding=2)
-        self.conv5 = nn.Conv2d(64, 32, kernel_size=3, stride=1, padding=2)
-        self.conv6 = nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=2)
-
-
-        self.avgpool = nn.AdaptiveAvgPool2d(3)
-        self.fc1 = nn.Linear(64*3*3, 512) # flattens cnn output
-        self.fc2 = nn.Linear(512, 26)
-
-    def forward(self, x):
-        x = F.relu(self.conv1(x))
-        x = F.relu(F.max_pool2d(self.conv2(x), 2))
-        x = F.relu(F.max_pool2d(self.conv3(x), 2))
-        x = F.relu(F.max_pool2d(self.conv4(x), 2))
-        x = F.relu(F.max_pool2d(self.conv5(x), 2))
-        x = F.relu(F.max_pool2d(self.conv6(x), 2))
-
-        x = F.relu(self.avgpool(x))
-
-        x = x.view(-1, 3*3*64)  # .view is reshape, this flattens X for the linear layers
-        x = F.relu(self.fc1(x))
-        x = F.dropout(x, p=0.5, training=self.training)
-        x = self.fc2(x)  # this is output layer. No activation.
-        return F.softmax(x, dim=1)
+# set USE_CACHE = True to reuse the preprocessed team dataset images from previous runs
+USE_CACHE = False
+preprocess_cache = PreprocessCache() if USE_CACHE else None
 
-'''testing'''
-alphabet_cnn = Net()
-alphabet_cnn.load_state_dict(torch.load(c.MODEL_SAVE_PATH + "/alphabet_model.pt", map_location=device))
-alphabet_cnn.cuda()
-alphabet_cnn.to('cpu') # puts model on cpu
+# set PRECISION = 'bf16' to run predict_az with bfloat16 autocast, compare accuracies with utilities/precision_report.py
+PRECISION = 'fp32'
+
+# predict_az runs its input through the model in micro-batches whose activations fit in MEMORY_BUDGET bytes, so memory
+# stays flat however many images are tested
+MEMORY_BUDGET = 512 * 1024 ** 2
 
-alpha_key = {0:"A", 1:"B", 2:"C", 3:"D", 4:"E", 5:"F", 6:"G", 7:"H", 8:"I", 9:"J", 10:"K", 11:"L", 12:"M", 13:"N",
-             14:"O", 15:"P", 16:"Q", 17:"R", 18:"S", 19:"T", 20:"U", 21:"V", 22:"W", 23:"X", 24:"Y", 25:"Z"}
+# number of processes loading and preprocessing the team dataset images (None uses every CPU).  PAD_TEAM_IMAGES fits
+# every team image into the model input (scaled down if it is bigger, then padded like the training data) so they can
+# be predicted in batches.  With PAD_TEAM_IMAGES = False the images keep their own sizes and are predicted one at a time
+TEAM_WORKERS = None
+PAD_TEAM_IMAGES = True
+
+'''testing'''
+# the checkpoint describes its network and classes, see models/checkpoint.py
+alphabet_cnn = load_model(c.MODEL_SAVE_PATH + "/alphabet_model.pt", device)
+alpha_key = alphabet_cnn.class_map
 
 # checks if two models have equal weights
 def check_equal(model1, model2):
@@ -68,37 +52,32 @@ def check_equal(model1, model2):
     return True
 
 ''' returns predictions from the model.  The default type 1 will return the predicted letter, type 2 will return a 
-one-hot-vector prediction for the inputs that can be used for comparison with the labels'''
+one-hot-vector prediction for the inputs that can be used for comparison with the labels.  input can be a memory
+mapped feature file, pass normalize=True to normalize its images a micro-batch at a time'''
 
-def predict_az(input, type=1):
+def predict_az(input, type=1, normalize=False):
     try:
         w, l = input.shape
     except ValueError:
         _, w, l = input.shape
 
-    input_tensor = torch.from_numpy(input).view(-1, w, l).type('torch.FloatTensor').to(device)
-    predict_vect = alphabet_cnn(input_tensor.view(-1, 1, w, l))
-    predict_vect = predict_vect.cpu()
-    predict_vect = predict_vect.detach().numpy()
+    predict_vect = predict_batched(alphabet_cnn, input.reshape(-1, w, l), MEMORY_BUDGET, normalize=normalize,
+                                   precision=PRECISION)
     if type == 1:
         predict_val = np.argmax(predict_vect)
         return alpha_key[predict_val], predict_vect
     if type == 2:
         return predict_vect
 
-# use this method to test the images from the team dataset since each image is a different size and needs to be loaded,
-# processed and predicted individually
+# use this method to test the images from the team dataset.  They are loaded and preprocessed by TEAM_WORKERS processes
+# and fitted to the model input (see PAD_TEAM_IMAGES), and each batch is predicted while the workers prepare the next
 def test_images_alphabet():
     letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X', 'Y']
     confusion = np.zeros((24, 24), dtype=int)
-    for letter in letters:
-        print('testing ' + letter)
-        for root, dirs, files in os.walk(c.TEAM_ALPHABET_IMGS_BASEDIR + letter):
-            for name in files:
-                px = preprocess_image(os.path.join(root, name))
-                predict, _ = predict_az(px)
-                num = confusion[letters.index(predict), letters.index(letter)] + 1
-                confusion[letters.index(predict), letters.index(letter)] = num
+    pad_to = alphabet_cnn.input_size if PAD_TEAM_IMAGES else None
+    for X, labels in team_batches(c.TEAM_ALPHABET_IMGS_BASEDIR, letters, preprocess_cache, TEAM_WORKERS, pad_to=pad_to):
+        for predict_val, letter in zip(np.argmax(predict_az(X, type=2), axis=1), labels):
+            confusion[letters.index(alpha_key[predict_val]), letters.index(letter)] += 1
     # accuracy and percision calcs
     num_correct = 0
     precision = np.zeros(24)
@@ -115,9 +94,10 @@ def test_images_alphabet():
     print(confusion)
 
 # use this method to test on a dataset with same sized images that can be processed as a batch and loaded from a saved
-# numpy array where preprocessing has already been done to save time
+# numpy array where preprocessing has already been done to save time.  alpha_X_test is a memory mapped feature file,
+# its images are read and normalized a micro-batch at a time
 def test(alpha_X_test, alpha_y_test):
-    alpha_predict_y = predict_az(alpha_X_test.reshape(-1, 200, 200), type=2)
+    alpha_predict_y = predict_az(alpha_X_test.reshape(-1, 200, 200), type=2, normalize=True)
     #print(alpha_predict_y)
 
     y1 = numeric_class(alpha_y_test)
@@ -137,23 +117,25 @@ def test_real_image(img_path):
 
 # Select testing regime.
 # SET = 1 corresponds to the noiseless dataset
-# SET = 2 corresponds to testing with team dataset (takes a long time to test b/c the images are all different sizes)
+# SET = 2 corresponds to testing with team dataset (the images are all different sizes, see test_images_alphabet)
 # SET = 0 corresponds to the default option of the noisy set obtained online
 SET = 1
 
-if SET == 1:
-    alpha_X_test = get_training_arr('alpha_validate_features_no_noise.npy')[:1000, :, :]
-    alpha_y_test = get_training_arr('alpha_validate_labels_no_noise.npy')[:1000, :]
-    print(alpha_X_test.shape, alpha_y_test.shape)
+# the team dataset is loaded by worker processes, which import this script, so the tests only run from __main__
+if __name__ == '__main__':
+    if SET == 1:
+        alpha_X_test = open_features('alpha_validate_features_no_noise.npy')[:1000, :, :]
+        alpha_y_test = get_training_arr('alpha_validate_labels_no_noise.npy')[:1000]
+        print(alpha_X_test.shape, alpha_y_test.shape)
 
-    test(alpha_X_test, alpha_y_test)
+        test(alpha_X_test, alpha_y_test)
 
-elif SET == 2:
-    test_images_alphabet()
+    elif SET == 2:
+        test_images_alphabet()
 
-else:
-    alpha_X_test = get_training_arr('alpha_test_inputs.npy')
-    alpha_y_test = get_training_arr('alphabet_test_labels.npy')
-    print(alpha_X_test.shape, alpha_y_test.shape)
+    else:
+        alpha_X_test = open_features('alpha_test_inputs.npy')
+        alpha_y_test = get_training_arr('alphabet_test_labels.npy')
+        print(alpha_X_test.shape, alpha_y_test.shape)
 
-    test(alpha_X_test, alpha_y_test)
+        test(alpha_X_test, alpha_y_test)
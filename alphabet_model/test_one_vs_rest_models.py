@@ -1,6 +1,4 @@
 import torch
-import torch.nn as nn
-import torch.nn.functional as F
 import sklearn.metrics
 import matplotlib.pyplot as plt
 import sys
@@ -9,6 +7,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from utilities.evaluation_metrics import *
 from utilities.data_processing import *
+from utilities.labels import one_vs_rest
+from utilities.feature_store import get_feature_arr
+from models.checkpoint import load_model
 
 ''' check for GPU, if no GPU, use CPU '''
 if torch.cuda.is_available():
@@ -19,49 +20,10 @@ else:
     print("Running on the CPU")
 device = torch.device("cpu")
 
-# alphabet model
-class Net(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = nn.Conv2d(1, 16, kernel_size=5, stride=1, padding=3)
-        self.conv2 = nn.Conv2d(16, 24, kernel_size=3, stride=1, padding=2)
-        self.conv3 = nn.Conv2d(24, 32, kernel_size=5, stride=1, padding=3)
-        self.conv4 = nn.Conv2d(32, 32, kernel_size=3, stride=1, padding=2)
-        self.conv5 = nn.Conv2d(32, 32, kernel_size=3, stride=1, padding=3)
-        self.conv6 = nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=3)
-        #self.conv8 = nn.Conv2d(24, 32, kernel_size=3, stride=1, padding=2)
-        #self.conv9 = nn.Conv2d(120, 160, kernel_size=3, stride=1, padding=2)
-
-        self.avgpool = nn.AdaptiveAvgPool2d(3)
-        self.fc1 = nn.Linear(64*3*3, 512) # flattens cnn output
-        self.fc2 = nn.Linear(512, 2)
-
-    def forward(self, x):
-        x = F.relu(self.conv1(x))
-        x = F.relu(F.max_pool2d(self.conv2(x), 2))
-        x = F.relu(F.max_pool2d(self.conv3(x), 2))
-        x = F.relu(F.max_pool2d(self.conv4(x), 2))
-        x = F.relu(F.max_pool2d(self.conv5(x), 2))
-        x = F.relu(F.max_pool2d(self.conv6(x), 2))
-        #x = F.relu(F.max_pool2d(self.conv7(x), 2))
-        #x = F.relu(F.max_pool2d(self.conv8(x), 2))
-        #x = F.relu(F.max_pool2d(self.conv9(x), 2))
-
-        x = F.relu(self.avgpool(x))
-
-        x = x.view(-1, 3*3*64)  # .view is reshape, this flattens X for the linear layers
-        x = F.relu(self.fc1(x))
-        x = F.dropout(x, p=0.5, training=self.training)
-        x = self.fc2(x)  # this is output layer. No activation.
-        return F.softmax(x, dim=1)
-
 '''testing'''
-w_vs_rest_cnn = Net()
-w_vs_rest_cnn.load_state_dict(torch.load(c.MODEL_SAVE_PATH + "/w_vs_rest_model.pt", map_location=device))
-w_vs_rest_cnn.cuda()
-w_vs_rest_cnn.to('cpu') # puts model on cpu
-
-alpha_key = {0:"W", 1:"NOT W"}
+# the checkpoint describes its network and classes, see models/checkpoint.py
+w_vs_rest_cnn = load_model(c.MODEL_SAVE_PATH + "/w_vs_rest_model.pt", device)
+alpha_key = w_vs_rest_cnn.class_map
 
 ''' returns predictions from the model.  The default type 1 will return the predicted letter, type 2 will return a 
 one-hot-vector prediction for the inputs that can be used for comparison with the labels'''
@@ -83,16 +45,7 @@ def predict_az(input, type=1):
 
 'convert labels to T/F 1 vs rest labels'
 def convert_labels_to_one_vs_rest(arr, letter):
-    arr = numeric_class(arr).astype(int)
-
-    count = 0
-    for i in arr:
-        if i == letter:
-            arr[count] = 0
-        else:
-            arr[count] = 1
-        count += 1
-    return one_hot_vector(arr, 2).astype(int)
+    return one_hot_vector(one_vs_rest(arr, letter), 2)
 
 
 
@@ -102,13 +55,13 @@ def convert_labels_to_one_vs_rest(arr, letter):
 SET = 0
 
 if SET == 1:
-    data_X = get_training_arr('w_vs_rest_features_shuffled.npy')
+    data_X = get_feature_arr('w_vs_rest_features_shuffled.npy')
     data_y = get_training_arr('w_vs_rest_labels_shuffled.npy')
 
     alpha_X_test = data_X[:100, :]
-    alpha_y_test = data_y[:100, :]
+    alpha_y_test = data_y[:100]
 else:
-    alpha_X_test = get_training_arr('alpha_test_inputs.npy')
+    alpha_X_test = get_feature_arr('alpha_test_inputs.npy')
     alpha_y_test = get_training_arr('alphabet_test_labels.npy')
 
 alpha_y_test = convert_labels_to_one_vs_rest(alpha_y_test, 0)
@@ -14,4 +14,8 @@ MODEL_SAVE_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) +
 ACTIVATION_LYR_1 = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + \
                      "/SOEN490AI/alphabet_model/visualize_activation1.npy"
 ACTIVATION_LYR_2 = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + \
-                   "/SOEN490AI/alphabet_model/visualize_activation2.npy"\
+                   "/SOEN490AI/alphabet_model/visualize_activation2.npy"
+PREPROCESS_CACHE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + \
+                   "/SOEN490AI/datasets/preprocess_cache/"
+ACTIVATION_CACHE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + \
+                   "/SOEN490AI/datasets/activation_cache/"
@@ -1,12 +1,15 @@
 import torch
-import torch.nn as nn
-import torch.nn.functional as F
 import sklearn.metrics
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 from utilities.data_processing import *
+from utilities.feature_store import open_features
+from utilities.preprocess_cache import PreprocessCache
+from utilities.team_dataset import team_batches
+from models.checkpoint import load_model
+from models.predictor import predict_batched
 import constants as c
 
 ''' check for GPU, if no GPU, use CPU '''
@@ -18,77 +21,50 @@ else:
     print("Running on the CPU")
 device = torch.device("cpu")
 
-# digit model
-class Net(nn.Module):
-    def __init__(self):
-        super().__init__()
-        self.conv1 = nn.Conv2d(1, 16, kernel_size=5, stride=1, padding=3)
-        self.conv2 = nn.Conv2d(16, 24, kernel_size=5, stride=1, padding=3)
-        self.conv3 = nn.Conv2d(24, 32, kernel_size=3, stride=1, padding=2)
-        self.conv4 = nn.Conv2d(32, 32, kernel_size=5, stride=1, padding=2)
-        self.conv5 = nn.Conv2d(32, 64, kernel_size=3, stride=1, padding=2)
-        self.conv6 = nn.Conv2d(64, 64, kernel_size=3, stride=1, padding=2)
-
-        self.avgpool = nn.AdaptiveAvgPool2d(3)
-        self.fc1 = nn.Linear(64*3*3, 512) # flattens cnn output
-        self.fc2 = nn.Linear(512, 10)
-
-    def forward(self, x):
-        x = F.relu(self.conv1(x))
-        x = x.cpu()
-        x = x.detach().numpy()
-        np.save('visualize_activation1.npy', x)
-        x = torch.from_numpy(x).type('torch.FloatTensor').to(device)
-
-        x = F.relu(F.max_pool2d(self.conv2(x), 2))
-        x = x.cpu()
-        x = x.detach().numpy()
-        np.save('visualize_activation2.npy', x)
-        x = torch.from_numpy(x).type('torch.FloatTensor').to(device)
-
-        x = F.relu(F.max_pool2d(self.conv3(x), 2))
-        x = F.relu(F.max_pool2d(self.conv4(x), 2))
-        x = F.relu(F.max_pool2d(self.conv5(x), 2))
-        x = F.relu(F.max_pool2d(self.conv6(x), 2))
-
-        x = F.relu(self.avgpool(x))
-
-        x = x.view(-1, 3*3*64)  # .view is reshape, this flattens X for the linear layers
-        x = F.relu(self.fc1(x))
-        x = F.dropout(x, p=0.5, training=self.training)
-        x = self.fc2(x)  # this is output layer. No activation.
-        return F.softmax(x, dim=1)
+# set USE_CACHE = True to reuse the preprocessed team dataset images from previous runs
+USE_CACHE = False
+preprocess_cache = PreprocessCache() if USE_CACHE else None
+
+# set PRECISION = 'bf16' to run predict_az with bfloat16 autocast, compare accuracies with utilities/precision_report.py
+PRECISION = 'fp32'
+
+# predict_az runs its input through the model in micro-batches whose activations fit in MEMORY_BUDGET bytes, so memory
+# stays flat however many images are tested
+MEMORY_BUDGET = 512 * 1024 ** 2
+
+# number of processes loading and preprocessing the team dataset images (None uses every CPU).  PAD_TEAM_IMAGES fits
+# every team image into the model input (scaled down if it is bigger, then padded like the training data) so they can
+# be predicted in batches.  With PAD_TEAM_IMAGES = False the images keep their own sizes and are predicted one at a time
+TEAM_WORKERS = None
+PAD_TEAM_IMAGES = True
 
 ''' returns predictions from the model.  The default type 1 will return the predicted letter, type 2 will return a 
-one-hot-vector prediction for the inputs that can be used for comparison with the labels'''
+one-hot-vector prediction for the inputs that can be used for comparison with the labels.  input can be a memory
+mapped feature file, pass normalize=True to normalize its images a micro-batch at a time'''
 
-def predict_az(input, type=1):
+def predict_az(input, type=1, normalize=False):
     try:
         w, l = input.shape
     except ValueError:
         _, w, l = input.shape
 
-    input_tensor = torch.from_numpy(input).view(-1, w, l).type('torch.FloatTensor').to(device)
-    predict_vect = digit_cnn(input_tensor.view(-1, 1, w, l))
-    predict_vect = predict_vect.cpu()
-    predict_vect = predict_vect.detach().numpy()
+    predict_vect = predict_batched(digit_cnn, input.reshape(-1, w, l), MEMORY_BUDGET, normalize=normalize,
+                                   precision=PRECISION)
     if type == 1:
         return np.argmax(predict_vect)
 
     if type == 2:
         return predict_vect
 
+# tests the images from the team dataset.  They are loaded and preprocessed by TEAM_WORKERS processes and fitted to the
+# model input (see PAD_TEAM_IMAGES), and each batch is predicted while the workers prepare the next
 def test_images_digit():
     digits = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']
     confusion = np.zeros((10, 10), dtype=int)
-    for digit in digits:
-        print('testing ' + digit)
-        for root, dirs, files in os.walk(c.TEAM_DIGIT_IMGS_BASEDIR + digit):
-            for name in files:
-                px = preprocess_image(os.path.join(root, name))
-                predict = predict_az(px)
-                num = confusion[int(digit), predict] + 1
-                confusion[int(digit), predict] = num
+    pad_to = digit_cnn.input_size if PAD_TEAM_IMAGES else None
+    for X, labels in team_batches(c.TEAM_DIGIT_IMGS_BASEDIR, digits, preprocess_cache, TEAM_WORKERS, pad_to=pad_to):
+        for predict, digit in zip(np.argmax(predict_az(X, type=2), axis=1), labels):
+            confusion[int(digit), predict] += 1
     # accuracy and percision calcs
     num_correct = 0
     precision = np.zeros(10)
@@ -105,32 +81,33 @@ def test_images_digit():
     print(confusion)
 
 '''testing'''
-digit_cnn = Net()
-digit_cnn.load_state_dict(torch.load(c.MODEL_SAVE_PATH + "/digit_model.pt", map_location=device))
-digit_cnn.cuda()
-digit_cnn.to('cpu') # puts model on cpu
+# the checkpoint describes its network, see models/checkpoint.py
+digit_cnn = load_model(c.MODEL_SAVE_PATH + "/digit_model.pt", device)
 
-# test using team noisy image dataset
-#test_images_digit()
+# the team dataset is loaded by worker processes, which import this script, so the tests only run from __main__
+if __name__ == '__main__':
+    # test using team noisy image dataset
+    #test_images_digit()
 
-''' load testing X and y to test on noisless dataset'''
-data_X = get_training_arr("digit_features_shuffled_no_noise.npy")
-data_y = get_training_arr('digit_labels_shuffled_no_noise.npy')
-print(data_y.shape, data_X.shape)
+    ''' load testing X and y to test on noisless dataset, the features are memory mapped and read a micro-batch at a
+    time'''
+    data_X = open_features("digit_features_shuffled_no_noise.npy")
+    data_y = get_training_arr('digit_labels_shuffled_no_noise.npy')
+    print(data_y.shape, data_X.shape)
 
-digit_X_test = data_X[:1000, :, :]
-alpha_y_test = data_y[:1000, :]
+    digit_X_test = data_X[:1000, :, :]
+    alpha_y_test = data_y[:1000]
 
-alpha_predict_y = predict_az(digit_X_test.reshape(-1, 200, 200), type=2)
-#print(alpha_predict_y)
+    alpha_predict_y = predict_az(digit_X_test.reshape(-1, 200, 200), type=2, normalize=True)
+    #print(alpha_predict_y)
 
-y1 = numeric_class(alpha_y_test)
-y2 = numeric_class(alpha_predict_y)
+    y1 = numeric_class(alpha_y_test)
+    y2 = numeric_class(alpha_predict_y)
 
-print(sklearn.metrics.accuracy_score(y1, y2))
-print(sklearn.metrics.precision_score(y1, y2, average='macro'))
-print(sklearn.metrics.recall_score(y1, y2, average='macro'))
-print(sklearn.metrics.confusion_matrix(y1, y2))
+    print(sklearn.metrics.accuracy_score(y1, y2))
+    print(sklearn.metrics.precision_score(y1, y2, average='macro'))
+    print(sklearn.metrics.recall_score(y1, y2, average='macro'))
+    print(sklearn.metrics.confusion_matrix(y1, y2))
 
 
 
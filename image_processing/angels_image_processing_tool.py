@@ -1,6 +1,12 @@
 import cv2
 import numpy as np
 
+# kernels used by process_image.  Anything that changes the output of the pipeline should be listed here so that it is
+# picked up by the preprocessing cache fingerprint in utilities/preprocess_cache.py
+BLUR_KERNEL = (5, 5)
+OPENING_KERNEL = (5, 5)
+SHARPEN_KERNEL = [[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]]
+
 
 def grayscale(img):
     gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -8,18 +14,18 @@ def grayscale(img):
     return gray_img
 
 def apply_gaussian_blur(img):
-    gaussian = cv2.GaussianBlur(np.float32(img), (5,5), 0)
+    gaussian = cv2.GaussianBlur(np.float32(img), BLUR_KERNEL, 0)
 
     return gaussian
 
 def opening_img(img):
-    kernel = np.ones((5,5), np.uint8)
+    kernel = np.ones(OPENING_KERNEL, np.uint8)
     opening = cv2.morphologyEx(img, cv2.MORPH_OPEN, kernel)
 
     return opening
 
 def sharpen(img):
-    kernel_sharpening = np.array([[-1,-1,-1], [-1, 9,-1], [-1,-1,-1]])
+    kernel_sharpening = np.array(SHARPEN_KERNEL)
     sharpened = cv2.filter2D(img,-1 , kernel_sharpening)
 
     return sharpened
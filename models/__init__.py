@@ -0,0 +1,4 @@
+from models.networks import ARCHITECTURES, ConvNet, MultiHeadNet, architecture_spec, build_network, network_from_spec
+from models.checkpoint import load_model, read_checkpoint, save_atomic, save_model
+from models.class_maps import ALPHABET, DIGITS, CLASS_MAPS
+from models.predictor import iter_predictions, predict_batched
@@ -0,0 +1,115 @@
+import argparse
+import functools
+import os
+import sys
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from models.networks import ARCHITECTURES, architecture_spec, network_from_spec
+from models.class_maps import CLASS_MAPS
+from utilities.feature_store import IMG_SIZE
+
+CHECKPOINT_FORMAT = 1
+
+# architectures of the checkpoints in trained_models/ saved before checkpoints described their network.  Note that
+# digit_model_noisy.pt is the network of train_digit_model.py, not the one of test_digit_model.py
+LEGACY_CHECKPOINTS = {
+    'alphabet_model.pt': 'alphabet',
+    'base_alphabet_model.pt': 'alphabet',
+    'digit_model.pt': 'digit',
+    'digit_model_noisy.pt': 'digit_noisy',
+    'a_vs_rest_model.pt': 'a_vs_rest',
+    'w_vs_rest_model.pt': 'w_vs_rest',
+}
+
+''' saves obj to path through a temporary file, so path always holds either the old or the new version'''
+def save_atomic(obj, path):
+    tmp_path = path + '.tmp'
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+''' saves the weights of net (a network or its state dict) together with everything needed to use them: the
+architecture spec (see models.networks.architecture_spec), the input size, the class map and the fingerprint of the
+preprocessing the training data went through (see utilities.preprocess_cache.pipeline_fingerprint, None if unknown)'''
+def save_model(net, path, spec, class_map=None, input_size=IMG_SIZE, preprocessing=None):
+    checkpoint = {
+        'format': CHECKPOINT_FORMAT,
+        'architecture': spec,
+        'input_size': input_size,
+        'class_map': class_map if class_map is not None else CLASS_MAPS.get(spec['name']),
+        'preprocessing': preprocessing,
+        'state_dict': net.state_dict() if isinstance(net, torch.nn.Module) else net,
+    }
+    save_atomic(checkpoint, path)
+
+''' returns the names of the ARCHITECTURES whose layers have the shapes of the weights in state_dict'''
+def matching_architectures(state_dict):
+    shapes = {k: tuple(v.shape) for k, v in state_dict.items()}
+    matches = []
+    for name in ARCHITECTURES:
+        expected = network_from_spec(architecture_spec(name)).state_dict()
+        if shapes == {k: tuple(v.shape) for k, v in expected.items()}:
+            matches.append(name)
+    return matches
+
+''' reads a checkpoint and returns it in the current format.  Checkpoints holding only a state dict (the ones saved
+before this format) get the architecture from LEGACY_CHECKPOINTS, or from the shapes of their weights when exactly one
+architecture matches; pass architecture to say which it is otherwise'''
+def read_checkpoint(path, map_location='cpu', architecture=None):
+    checkpoint = torch.load(path, map_location=map_location)
+    if 'format' in checkpoint:
+        return checkpoint
+
+    name = architecture or LEGACY_CHECKPOINTS.get(os.path.basename(path))
+    if name is None:
+        matches = matching_architectures(checkpoint)
+        if len(matches) != 1:
+            raise ValueError(f"can't tell the architecture of {path}, it matches {matches or 'none'} of the "
+                             f"architectures; pass architecture=")
+        name = matches[0]
+    return {
+        'format': CHECKPOINT_FORMAT,
+        'architecture': architecture_spec(name),
+        'input_size': IMG_SIZE,
+        'class_map': CLASS_MAPS.get(name),
+        'preprocessing': None, # not recorded by the old checkpoints
+        'state_dict': checkpoint,
+    }
+
+@functools.lru_cache(maxsize=16)
+def _load_model(path, mtime, device):
+    checkpoint = read_checkpoint(path, map_location=device)
+    net = network_from_spec(checkpoint['architecture'])
+    net.load_state_dict(checkpoint['state_dict'])
+    net.to(device)
+    net.eval()
+    net.spec = checkpoint['architecture']
+    net.input_size = checkpoint['input_size']
+    net.class_map = checkpoint['class_map']
+    net.preprocessing = checkpoint['preprocessing']
+    return net
+
+''' returns the network saved in a checkpoint (either format) in eval mode, with its spec, input_size, class_map and
+preprocessing as attributes.  Models are cached: loading the same unchanged file again returns the same network, so it
+is shared and must not be trained or modified'''
+def load_model(path, device='cpu'):
+    path = os.path.abspath(path)
+    return _load_model(path, os.path.getmtime(path), str(device))
+
+''' rewrites a checkpoint in the current format, in place'''
+def upgrade_checkpoint(path, architecture=None):
+    checkpoint = read_checkpoint(path, architecture=architecture)
+    net = network_from_spec(checkpoint['architecture'])
+    net.load_state_dict(checkpoint['state_dict'])
+    save_model(net, path, checkpoint['architecture'], checkpoint['class_map'], checkpoint['input_size'],
+               checkpoint['preprocessing'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='rewrite old checkpoints (state dicts only) in the current format')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--architecture', choices=sorted(ARCHITECTURES),
+                        help='architecture of the checkpoints, when it cannot be worked out')
+    args = parser.parse_args()
+    for path in args.paths:
+        upgrade_checkpoint(path, args.architecture)
+        print('upgraded ' + path)
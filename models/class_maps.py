@@ -0,0 +1,20 @@
+# class number to name maps stored in the checkpoints, so a prediction can be turned into a letter or digit without
+# knowing which script trained the model
+ALPHABET = {0:"A", 1:"B", 2:"C", 3:"D", 4:"E", 5:"F", 6:"G", 7:"H", 8:"I", 9:"J", 10:"K", 11:"L", 12:"M", 13:"N",
+            14:"O", 15:"P", 16:"Q", 17:"R", 18:"S", 19:"T", 20:"U", 21:"V", 22:"W", 23:"X", 24:"Y", 25:"Z"}
+DIGITS = {i: str(i) for i in range(10)}
+
+''' class map of a one-vs-rest model for the letter of class positive (class 0 is the letter, 1 the rest)'''
+def one_vs_rest(positive, classes=ALPHABET):
+    return {0: classes[positive], 1: "NOT " + classes[positive]}
+
+# default class map of each architecture in models.networks.ARCHITECTURES
+CLASS_MAPS = {
+    'alphabet': ALPHABET,
+    'alphabet_heads': ALPHABET,
+    'digit': DIGITS,
+    'digit_noisy': DIGITS,
+    'digit_heads': DIGITS,
+    'a_vs_rest': one_vs_rest(0),
+    'w_vs_rest': one_vs_rest(22),
+}
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import time
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from models.checkpoint import read_checkpoint
+from models.networks import network_from_spec
+from models.scripted import METADATA_FILE, load_scripted_model
+
+BENCHMARK_BATCH_SIZES = (1, 8, 64)
+
+''' returns the network of a checkpoint as a frozen TorchScript module: the graph is traced (so the conv loop and the
+reshapes are unrolled) and frozen (weights become constants and are folded).  optimize_for_inference is applied by
+load_scripted_model after loading, its output cannot be saved and loaded back'''
+def script_model(net, input_size):
+    net.eval()
+    example = torch.zeros(1, 1, input_size, input_size)
+    with torch.no_grad():
+        traced = torch.jit.trace(net, example)
+    return torch.jit.freeze(traced)
+
+''' exports the checkpoint at path (either checkpoint format) to a TorchScript file at output, with the checkpoint's
+metadata stored next to the graph for load_scripted_model.  Returns the eager network and the exported module'''
+def export_model(path, output):
+    checkpoint = read_checkpoint(path)
+    net = network_from_spec(checkpoint['architecture'])
+    net.load_state_dict(checkpoint['state_dict'])
+    scripted = script_model(net, checkpoint['input_size'])
+    metadata = {k: checkpoint[k] for k in ('architecture', 'input_size', 'class_map', 'preprocessing')}
+    torch.jit.save(scripted, output, _extra_files={METADATA_FILE: json.dumps(metadata)})
+    return net, scripted
+
+''' returns the mean time in ms of a forward pass of model over a batch of batch_size images'''
+def time_model(model, batch_size, input_size, repeats=20, warmup=3):
+    X = torch.rand(batch_size, 1, input_size, input_size)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(X)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(X)
+    return (time.perf_counter() - start) / repeats * 1000
+
+''' prints the latency of the eager network and the exported module at each batch size, and the largest difference
+between their outputs'''
+def benchmark(net, scripted, input_size, batch_sizes=BENCHMARK_BATCH_SIZES):
+    with torch.no_grad():
+        X = torch.rand(max(batch_sizes), 1, input_size, input_size)
+        diff = (net(X) - scripted(X)).abs().max().item()
+    print('batch size, eager ms, torchscript ms, speedup')
+    for batch_size in batch_sizes:
+        eager = time_model(net, batch_size, input_size)
+        frozen = time_model(scripted, batch_size, input_size)
+        print(f"{batch_size}, {round(eager, 3)}, {round(frozen, 3)}, {round(eager / frozen, 2)}")
+    print('max output difference: ' + str(diff))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='export a checkpoint as a frozen TorchScript model')
+    parser.add_argument('path', help='checkpoint to export, e.g. trained_models/digit_model.pt')
+    parser.add_argument('--output', help='TorchScript file, defaults to <checkpoint name>_scripted.pt next to it')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare the latency with the eager model at batch sizes 1, 8 and 64')
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.path)[0] + '_scripted.pt'
+    net, scripted = export_model(args.path, output)
+    print('exported ' + output)
+    if args.benchmark:
+        # benchmark the file as it will be served, loaded without the training code
+        scripted, metadata = load_scripted_model(output)
+        benchmark(net, scripted, metadata['input_size'])
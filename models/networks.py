@@ -0,0 +1,87 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# conv layers of the CNNs in this repo as (out_channels, kernel_size, padding).  Every conv has stride 1 and every conv
+# after the first is followed by a 2x2 max pool.  The names match the checkpoints in trained_models/.
+# Checkpoints store the full spec of their network, so changing an entry here does not break existing checkpoints
+ARCHITECTURES = {
+    'alphabet': {'convs': [(16, 5, 3), (24, 5, 3), (32, 5, 2), (64, 5, 2), (32, 3, 2), (64, 3, 2)], 'num_classes': 26},
+    'digit': {'convs': [(16, 5, 3), (24, 5, 3), (32, 3, 2), (32, 5, 2), (64, 3, 2), (64, 3, 2)], 'num_classes': 10},
+    'digit_noisy': {'convs': [(16, 5, 3), (24, 5, 3), (24, 3, 2), (32, 5, 2), (32, 3, 2), (64, 3, 2)],
+                    'num_classes': 10},
+    'a_vs_rest': {'convs': [(16, 3, 2), (16, 5, 3), (32, 3, 2), (32, 5, 2), (64, 5, 3), (88, 3, 3)], 'num_classes': 2},
+    'w_vs_rest': {'convs': [(16, 5, 3), (24, 3, 2), (32, 5, 3), (32, 3, 2), (32, 3, 3), (64, 3, 3)], 'num_classes': 2},
+    # one binary one-vs-rest head per class on the backbone of the multi-class model (see MultiHeadNet)
+    'alphabet_heads': {'convs': [(16, 5, 3), (24, 5, 3), (32, 5, 2), (64, 5, 2), (32, 3, 2), (64, 3, 2)],
+                       'num_classes': 26, 'multi_head': True},
+    'digit_heads': {'convs': [(16, 5, 3), (24, 5, 3), (32, 3, 2), (32, 5, 2), (64, 3, 2), (64, 3, 2)],
+                    'num_classes': 10, 'multi_head': True},
+}
+
+''' the CNN used by all the models, built from a list of conv layer specs (see ARCHITECTURES).  Layers are registered as
+conv1..convN, avgpool, fc1, fc2 so the state dicts are the same as those of the original Net classes and the
+checkpoints in trained_models/ load directly'''
+class ConvNet(nn.Module):
+    def __init__(self, convs, num_classes, hidden=512, pool_size=3):
+        super().__init__()
+        in_channels = 1
+        for i, (out_channels, kernel_size, padding) in enumerate(convs, 1):
+            setattr(self, 'conv' + str(i), nn.Conv2d(in_channels, out_channels, kernel_size=kernel_size, stride=1,
+                                                     padding=padding))
+            in_channels = out_channels
+        self.num_convs = len(convs)
+
+        self.avgpool = nn.AdaptiveAvgPool2d(pool_size)
+        self.fc1 = nn.Linear(in_channels * pool_size * pool_size, hidden) # flattens cnn output
+        self.fc2 = nn.Linear(hidden, num_classes)
+
+    ''' runs conv layers start+1..stop (all of them by default) on x, which is the output of conv layer start'''
+    def features(self, x, start=0, stop=None):
+        for i in range(start + 1, (self.num_convs if stop is None else stop) + 1):
+            conv = getattr(self, 'conv' + str(i))
+            x = F.relu(conv(x)) if i == 1 else F.relu(F.max_pool2d(conv(x), 2))
+        return x
+
+    ''' returns the output of fc1 (after dropout), the input of the output layer'''
+    def embed(self, x, skip=0):
+        x = self.features(x, start=skip)
+
+        x = F.relu(self.avgpool(x))
+
+        x = torch.flatten(x, 1)  # flattens X for the linear layers
+        x = F.relu(self.fc1(x))
+        return F.dropout(x, p=0.5, training=self.training)
+
+    ''' x is an image batch, or with skip > 0 the output of conv layer skip (see training/activation_cache.py)'''
+    def forward(self, x, skip=0):
+        x = self.fc2(self.embed(x, skip))  # this is output layer. No activation.
+        return F.softmax(x, dim=1)
+
+''' the one-vs-rest classifiers of all the classes in one network: the ConvNet backbone with one binary head per class.
+Row i of fc2 is the head of class i, so one forward pass returns num_classes independent logits and torch.sigmoid of
+logit i is the probability that the image is class i rather than the rest.  Train it with
+training.one_vs_rest.OneVsRestLoss'''
+class MultiHeadNet(ConvNet):
+    def forward(self, x, skip=0):
+        return self.fc2(self.embed(x, skip))
+
+''' returns the complete description of one of the named ARCHITECTURES, the dictionary stored in checkpoints (see
+models/checkpoint.py).  width scales the number of channels of every conv layer (a network with width != 1 cannot
+load the checkpoints of the original architecture)'''
+def architecture_spec(name, width=1.0):
+    spec = {'name': name, 'multi_head': False, 'hidden': 512, 'pool_size': 3}
+    spec.update(ARCHITECTURES[name])
+    spec['convs'] = [(max(1, round(out_channels * width)), kernel_size, padding)
+                     for out_channels, kernel_size, padding in spec['convs']]
+    return spec
+
+''' builds the network described by an architecture spec'''
+def network_from_spec(spec):
+    network = MultiHeadNet if spec.get('multi_head', False) else ConvNet
+    return network([tuple(conv) for conv in spec['convs']], spec['num_classes'], hidden=spec.get('hidden', 512),
+                   pool_size=spec.get('pool_size', 3))
+
+''' builds the network for one of the named ARCHITECTURES'''
+def build_network(name, width=1.0):
+    return network_from_spec(architecture_spec(name, width))
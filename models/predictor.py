@@ -0,0 +1,59 @@
+import numpy as np
+import torch
+
+from training.step import autocast
+from utilities.feature_store import normalize_batch
+
+DEFAULT_MEMORY_BUDGET = 512 * 1024 ** 2
+SAFETY_FACTOR = 2 # the functional relus and max pools make temporaries the module hooks do not see
+
+''' returns an estimate of the memory in bytes one height x width image takes while it goes through net: the largest
+input plus output of any layer, times SAFETY_FACTOR.  Measured once per network and image size with forward hooks'''
+def bytes_per_image(net, height, width):
+    cache = net.__dict__.setdefault('_bytes_per_image', {})
+    if (height, width) not in cache:
+        sizes = []
+        def hook(module, inputs, output):
+            sizes.append(sum(t.numel() * t.element_size() for t in inputs + (output,)))
+        handles = [m.register_forward_hook(hook) for m in net.modules() if not list(m.children())]
+        try:
+            with torch.no_grad():
+                net(torch.zeros(1, 1, height, width, device=next(net.parameters()).device))
+        finally:
+            for handle in handles:
+                handle.remove()
+        cache[height, width] = max(sizes) * SAFETY_FACTOR
+    return cache[height, width]
+
+''' returns the largest batch size of height x width images whose activations fit in memory_budget bytes (at least 1)'''
+def batch_size_for_budget(net, height, width, memory_budget=DEFAULT_MEMORY_BUDGET):
+    return max(1, int(memory_budget // bytes_per_image(net, height, width)))
+
+''' runs images (an n x w x h array of preprocessed images, which can be a memory map) through net in micro-batches
+sized so the activations stay within memory_budget bytes, yielding (start, probabilities of images[start:start+k]) as
+each micro-batch finishes.  Only one micro-batch of images is in memory at a time, so memory stays flat however many
+images there are.  normalize=True applies the min-max normalization of the feature files to each micro-batch, for
+memory mapped feature files opened with feature_store.open_features'''
+def iter_predictions(net, images, memory_budget=DEFAULT_MEMORY_BUDGET, batch_size=None, normalize=False,
+                     precision='fp32'):
+    n, w, l = len(images), images.shape[-2], images.shape[-1]
+    device = next(net.parameters()).device
+    batch_size = batch_size or batch_size_for_budget(net, w, l, memory_budget)
+    net.eval()
+    for start in range(0, n, batch_size):
+        batch = images[start:start + batch_size]
+        batch = normalize_batch(batch) if normalize else np.array(batch, dtype=np.float32)
+        X = torch.from_numpy(batch).view(-1, 1, w, l).to(device)
+        with torch.no_grad(), autocast(device, precision):
+            out = net(X)
+        yield start, out.float().cpu().numpy()
+
+''' returns the probabilities of all the images as one n x classes array, see iter_predictions'''
+def predict_batched(net, images, memory_budget=DEFAULT_MEMORY_BUDGET, batch_size=None, normalize=False,
+                    precision='fp32'):
+    out = None
+    for start, probabilities in iter_predictions(net, images, memory_budget, batch_size, normalize, precision):
+        if out is None:
+            out = np.empty((len(images), probabilities.shape[1]), dtype=np.float32)
+        out[start:start + len(probabilities)] = probabilities
+    return out
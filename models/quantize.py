@@ -0,0 +1,140 @@
+import argparse
+import copy
+import io
+import json
+import os
+import sys
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import constants as c
+from models.checkpoint import read_checkpoint
+from models.networks import network_from_spec
+from models.scripted import METADATA_FILE
+from models.export import time_model, BENCHMARK_BATCH_SIZES
+from utilities.datasets import FeatureDataset
+from utilities.labels import one_vs_rest
+
+# the models quantized by default, as (checkpoint, features file, labels file, positive class of a one-vs-rest model).
+# Calibration and evaluation use the preprocessed validation data.  Models whose checkpoint is not in trained_models/
+# are skipped
+MODELS = {
+    'digit': ('digit_model.pt', 'digit_features_shuffled_no_noise.npy', 'digit_labels_shuffled_no_noise.npy', None),
+    'alphabet': ('alphabet_model.pt', 'alpha_validate_features_no_noise.npy', 'alpha_validate_labels_no_noise.npy',
+                 None),
+    'a_vs_rest': ('a_vs_rest_model.pt', 'alpha_validate_features_no_noise.npy', 'alpha_validate_labels_no_noise.npy',
+                  0),
+    'w_vs_rest': ('w_vs_rest_model.pt', 'alpha_validate_features_no_noise.npy', 'alpha_validate_labels_no_noise.npy',
+                  22),
+}
+CALIBRATION_SIZE = 200
+EVAL_SIZE = 1000
+BATCH_SIZE = 100
+
+''' calls net with the image batch only, so tracing does not see the optional skip argument of its forward'''
+class ImageInput(nn.Module):
+    def __init__(self, net):
+        super().__init__()
+        self.net = net
+
+    def forward(self, x):
+        return self.net(x)
+
+''' returns a static int8 version of net: observers are inserted after every conv and linear layer, calibrate(model)
+runs representative data through it to record the activation ranges, and the layers are then replaced by int8
+kernels (fbgemm/x86 on intel and amd cpus, qnnpack on arm) with the relus fused into the convs'''
+def quantize_static(net, input_size, calibrate):
+    net.eval()
+    engine = 'qnnpack' if 'fbgemm' not in torch.backends.quantized.supported_engines else 'fbgemm'
+    torch.backends.quantized.engine = engine
+    example = (torch.zeros(1, 1, input_size, input_size),)
+    prepared = prepare_fx(ImageInput(copy.deepcopy(net)), get_default_qconfig_mapping(engine), example)
+    with torch.no_grad():
+        calibrate(prepared)
+    return convert_fx(prepared).eval()
+
+''' returns the size in MB of the serialized weights of a model'''
+def model_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1024 ** 2
+
+def predict(model, dataset, indices):
+    predictions = []
+    with torch.no_grad():
+        for start in range(0, len(indices), BATCH_SIZE):
+            X = torch.stack([dataset[i][0] for i in indices[start:start + BATCH_SIZE]])
+            predictions.append(model(X).argmax(dim=1).numpy())
+    return np.concatenate(predictions)
+
+''' returns the accuracy of predictions for each class that occurs in y, as a dictionary'''
+def per_class_accuracy(predictions, y):
+    return {int(k): float(np.mean(predictions[y == k] == k)) for k in np.unique(y)}
+
+''' quantizes one of the MODELS, saves it as a TorchScript file next to its checkpoint (loadable with
+models.scripted.load_scripted_model) and prints the accuracy of every class before and after quantization, the
+latency at the benchmark batch sizes and the size of the weights'''
+def quantize_model(name, calibration_size=CALIBRATION_SIZE, eval_size=EVAL_SIZE, seed=0):
+    checkpoint_file, features, labels, positive = MODELS[name]
+    path = os.path.join(c.MODEL_SAVE_PATH, checkpoint_file)
+    if not os.path.exists(path):
+        print(f"{name}: skipped, {path} does not exist")
+        return
+    checkpoint = read_checkpoint(path)
+    net = network_from_spec(checkpoint['architecture'])
+    net.load_state_dict(checkpoint['state_dict'])
+    net.eval()
+    input_size = checkpoint['input_size']
+
+    dataset = FeatureDataset(features, labels)
+    y = dataset.labels if positive is None else one_vs_rest(dataset.labels, positive).astype(np.int64)
+    # calibrate on a random sample and evaluate on other samples, so the report is not flattered by the calibration
+    order = np.random.RandomState(seed).permutation(len(dataset))
+    calibration = np.sort(order[:calibration_size])
+    evaluation = np.sort(order[calibration_size:calibration_size + eval_size])
+
+    def calibrate(model):
+        for start in range(0, len(calibration), BATCH_SIZE):
+            model(torch.stack([dataset[i][0] for i in calibration[start:start + BATCH_SIZE]]))
+    quantized = quantize_static(net, input_size, calibrate)
+
+    example = torch.zeros(1, 1, input_size, input_size)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(quantized, example))
+    output = os.path.splitext(path)[0] + '_int8.pt'
+    metadata = {k: checkpoint[k] for k in ('architecture', 'input_size', 'class_map', 'preprocessing')}
+    metadata['quantization'] = 'static int8, ' + torch.backends.quantized.engine
+    torch.jit.save(scripted, output, _extra_files={METADATA_FILE: json.dumps(metadata)})
+
+    y_eval = y[evaluation]
+    fp32 = per_class_accuracy(predict(net, dataset, evaluation), y_eval)
+    int8 = per_class_accuracy(predict(scripted, dataset, evaluation), y_eval)
+    class_map = checkpoint['class_map'] or {}
+    print(f"{name}: saved {output}")
+    print('class, fp32 accuracy, int8 accuracy, delta')
+    for k in fp32:
+        print(f"{class_map.get(k, k)}, {round(fp32[k], 4)}, {round(int8[k], 4)}, {round(int8[k] - fp32[k], 4)}")
+    fp32_total = np.mean([fp32[k] for k in fp32])
+    int8_total = np.mean([int8[k] for k in int8])
+    print(f"mean, {round(fp32_total, 4)}, {round(int8_total, 4)}, {round(int8_total - fp32_total, 4)}")
+
+    print('batch size, fp32 ms, int8 ms, speedup')
+    for batch_size in BENCHMARK_BATCH_SIZES:
+        eager = time_model(net, batch_size, input_size)
+        fast = time_model(scripted, batch_size, input_size)
+        print(f"{batch_size}, {round(eager, 3)}, {round(fast, 3)}, {round(eager / fast, 2)}")
+    print(f"weights: fp32 {round(model_size_mb(net), 2)} MB, int8 {round(model_size_mb(quantized), 2)} MB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='static int8 post training quantization of the trained models')
+    parser.add_argument('models', nargs='*', default=list(MODELS), help='models to quantize (default: all)')
+    parser.add_argument('--calibration-size', type=int, default=CALIBRATION_SIZE,
+                        help='number of validation images used to calibrate the activation ranges')
+    parser.add_argument('--eval-size', type=int, default=EVAL_SIZE)
+    args = parser.parse_args()
+    for name in args.models:
+        quantize_model(name, args.calibration_size, args.eval_size)
@@ -0,0 +1,19 @@
+import json
+import torch
+
+METADATA_FILE = 'metadata.json'
+
+''' loads a model exported by models/export.py.  Only needs torch: the frozen graph holds the network and the
+metadata (architecture spec, input size, class map and preprocessing fingerprint) is stored next to it in the file.
+Returns the TorchScript module and the metadata dictionary (with integer class numbers in the class map).
+With optimize the float models are passed through optimize_for_inference, which fuses conv + relu and picks the fastest
+CPU kernels.  It is done here because its output cannot be saved and loaded back'''
+def load_scripted_model(path, device='cpu', optimize=True):
+    extra_files = {METADATA_FILE: ''}
+    module = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+    metadata = json.loads(extra_files[METADATA_FILE] or '{}')
+    if optimize and 'quantization' not in metadata:
+        module = torch.jit.optimize_for_inference(module)
+    if metadata.get('class_map') is not None:
+        metadata['class_map'] = {int(k): v for k, v in metadata['class_map'].items()}
+    return module, metadata
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+torch = pytest.importorskip('torch')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from models.checkpoint import save_model
+from models.class_maps import DIGITS
+from models.export import export_model
+from models.networks import architecture_spec, network_from_spec
+from models.scripted import load_scripted_model
+
+''' an exported model loads back with load_scripted_model, keeps its metadata and gives the outputs of the eager
+network'''
+def test_export_round_trip(tmp_path):
+    torch.manual_seed(0)
+    spec = architecture_spec('digit')
+    checkpoint = str(tmp_path / 'digit_model.pt')
+    save_model(network_from_spec(spec), checkpoint, spec, input_size=64)
+    output = str(tmp_path / 'digit_model_scripted.pt')
+    net, _ = export_model(checkpoint, output)
+
+    scripted, metadata = load_scripted_model(output)
+    assert metadata['input_size'] == 64
+    assert metadata['class_map'] == DIGITS
+    X = torch.rand(4, 1, 64, 64)
+    with torch.no_grad():
+        assert torch.allclose(net(X), scripted(X), atol=1e-5)
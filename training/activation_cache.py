@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset
+
+import constants as c
+from utilities.datasets import FeatureDataset
+from utilities.preprocess_cache import file_digest
+
+CACHE_DTYPE = np.float16 # activations are post-ReLU and well inside float16 range, half the size of float32
+BATCH_SIZE = 100
+
+''' returns a short hash of everything that determines the cached activations: the weights of the frozen layers (the
+contents of the checkpoint), the architecture, how many conv layers are cached and which samples of which feature file
+(identified by its size and modification time, hashing a multi GB file would take longer than building the cache)'''
+def cache_key(architecture, checkpoint, layers, spec):
+    stat = os.stat(spec['features'])
+    params = {'architecture': architecture, 'checkpoint': file_digest(checkpoint), 'layers': layers,
+              'features': os.path.abspath(spec['features']), 'size': stat.st_size, 'mtime': stat.st_mtime,
+              'start': spec.get('start', 0), 'stop': spec.get('stop'), 'dtype': np.dtype(CACHE_DTYPE).name}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+''' runs the first layers conv layers of net over every image of dataset (a FeatureDataset) and writes their output to
+fname as a memory mapped (n x channels x w x h) CACHE_DTYPE array.  The file is written under a temporary name and
+renamed when complete, so an interrupted run never leaves a truncated cache behind'''
+def build_activation_cache(net, layers, dataset, fname, device, batch_size=BATCH_SIZE):
+    net.eval()
+    partial_fname = fname + '.partial'
+    out = None
+    with torch.no_grad():
+        for start in range(0, len(dataset), batch_size):
+            X, _ = dataset.get_batch(start, min(start + batch_size, len(dataset)))
+            activations = net.features(X.to(device), stop=layers).cpu().numpy()
+            if out is None:
+                out = np.lib.format.open_memmap(partial_fname, mode='w+', dtype=CACHE_DTYPE,
+                                                shape=(len(dataset),) + activations.shape[1:])
+            out[start:start + len(activations)] = activations
+    out.flush()
+    del out
+    os.replace(partial_fname, fname)
+
+''' dataset over a cached activation file and the labels of the FeatureDataset it was built from.  Like FeatureDataset
+the file is memory mapped lazily so every DataLoader worker opens its own map.
+Items are (channels x w x h float32 tensor, class number)'''
+class ActivationDataset(Dataset):
+    def __init__(self, activations_file, labels):
+        self.activations_file = activations_file
+        self.labels = labels
+        self._activations = None
+
+    @property
+    def activations(self):
+        if self._activations is None:
+            self._activations = np.load(self.activations_file, mmap_mode='r')
+        return self._activations
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_activations'] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        return torch.from_numpy(self.activations[i].astype(np.float32)), int(self.labels[i])
+
+    def get_batch(self, start, stop):
+        x = self.activations[start:stop].astype(np.float32)
+        return torch.from_numpy(x), torch.from_numpy(self.labels[start:stop])
+
+''' returns an ActivationDataset with the output of the first layers conv layers of net for the data in spec (a dataset
+spec of the training config), building the cache file in cache_dir the first time'''
+def cached_dataset(net, architecture, checkpoint, layers, spec, device, cache_dir=c.ACTIVATION_CACHE_DIR):
+    dataset = FeatureDataset(spec['features'], spec['labels'], start=spec.get('start', 0), stop=spec.get('stop'))
+    fname = os.path.join(cache_dir, architecture + '-' + cache_key(architecture, checkpoint, layers, spec) + '.npy')
+    if not os.path.exists(fname):
+        print('caching the output of the frozen layers for ' + spec['features'])
+        os.makedirs(cache_dir, exist_ok=True)
+        build_activation_cache(net, layers, dataset, fname, device)
+    return ActivationDataset(fname, dataset.labels)
+
+''' the layers of net after the first skip conv layers.  Trained on the cached activations of the frozen layers it
+updates the same parameters as the full network, so net is saved as usual'''
+class TrainableLayers(nn.Module):
+    def __init__(self, net, skip):
+        super().__init__()
+        self.net = net
+        self.skip = skip
+
+    def forward(self, x):
+        return self.net(x, skip=self.skip)
@@ -0,0 +1,80 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import torch
+
+from models.checkpoint import save_atomic
+
+CHECKPOINT_NAME = 'checkpoint-{:09d}.pt'
+CHECKPOINT_PATTERN = re.compile(r'checkpoint-(\d+)\.pt$')
+
+''' returns a copy of a (nested) state dictionary with every tensor cloned to the cpu, so it can be serialized while
+training keeps updating the originals'''
+def snapshot(state):
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {k: snapshot(v) for k, v in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(v) for v in state)
+    return state
+
+''' returns the paths of the checkpoints in directory, oldest first'''
+def list_checkpoints(directory):
+    steps = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        match = CHECKPOINT_PATTERN.match(name)
+        if match:
+            steps.append(int(match.group(1)))
+    return [os.path.join(directory, CHECKPOINT_NAME.format(step)) for step in sorted(steps)]
+
+''' returns the path of the newest checkpoint in directory, or None if there is none'''
+def latest_checkpoint(directory):
+    paths = list_checkpoints(directory)
+    return paths[-1] if paths else None
+
+''' writes training checkpoints to directory every every_steps steps and/or every_minutes minutes.  save() snapshots
+the state on the calling thread and serializes it on a background thread, writing through a temporary file so a crash
+mid-write never corrupts a checkpoint.  Only the last keep checkpoints are kept.
+Checkpoints are named by step, latest_checkpoint() returns the newest one to resume from'''
+class CheckpointManager:
+    def __init__(self, directory, every_steps=None, every_minutes=None, keep=3):
+        self.directory = directory
+        self.every_steps = every_steps
+        self.every_minutes = every_minutes
+        self.keep = keep
+        self.last_step = 0
+        self.last_time = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        os.makedirs(directory, exist_ok=True)
+
+    ''' returns True when a checkpoint should be saved at step'''
+    def due(self, step):
+        if self.every_steps and step - self.last_step >= self.every_steps:
+            return True
+        return bool(self.every_minutes) and time.time() - self.last_time >= self.every_minutes * 60
+
+    ''' saves state (a dictionary of state dicts, tensors and plain values) as the checkpoint of step.  Waits for the
+    previous checkpoint to be written first, so at most one snapshot is held in memory'''
+    def save(self, state, step):
+        self.wait()
+        self.last_step = step
+        self.last_time = time.time()
+        self._pending = self._executor.submit(self._write, snapshot(state), step)
+
+    def _write(self, state, step):
+        save_atomic(state, os.path.join(self.directory, CHECKPOINT_NAME.format(step)))
+        for path in list_checkpoints(self.directory)[:-self.keep]:
+            os.remove(path)
+
+    ''' waits for the checkpoint being written, raising any error the write ran into'''
+    def wait(self):
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
@@ -0,0 +1,72 @@
+import os
+import socket
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import Sampler
+
+''' gives each of world_size processes a disjoint, contiguous slice of the dataset so every worker streams its own
+region of the memory mapped feature files.  All slices have the same length (up to world_size - 1 trailing samples are
+dropped) so every worker runs the same number of steps and the gradient all-reduces stay in lockstep.  With
+num_replicas=1 the slice is the whole dataset, which is what a single process trainer uses.
+With shuffle=True the order inside the slice changes every epoch but only depends on seed and the epoch, and
+set_epoch(epoch, start) skips the first start samples of that order, so a resumed run continues exactly where the
+checkpoint was taken'''
+class ContiguousShardSampler(Sampler):
+    def __init__(self, dataset, num_replicas=1, rank=0, shuffle=False, seed=0):
+        self.shard_size = len(dataset) // num_replicas
+        self.start = rank * self.shard_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.skip = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.skip = start
+
+    def __len__(self):
+        return self.shard_size - self.skip
+
+    def __iter__(self):
+        indices = np.arange(self.start, self.start + self.shard_size)
+        if self.shuffle:
+            np.random.RandomState(self.seed + self.epoch).shuffle(indices)
+        return iter(indices[self.skip:].tolist())
+
+''' returns seed, or when it is None a random seed drawn by rank 0 and broadcast to every process, so the samplers of
+all the processes shuffle the same way, their shards stay disjoint and the seed saved by rank 0 resumes all of them'''
+def shared_seed(seed=None, world_size=1):
+    if seed is not None:
+        return seed
+    seed = torch.tensor([np.random.randint(2 ** 31)], dtype=torch.int64)
+    if world_size > 1:
+        dist.broadcast(seed, src=0)
+    return int(seed.item())
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _worker(rank, world_size, port, threads, config):
+    # imported here so the engine can import this module without a cycle
+    from training.engine import Trainer
+
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    torch.set_num_threads(threads)
+    try:
+        Trainer(config, device=torch.device('cpu'), rank=rank, world_size=world_size).train()
+    finally:
+        dist.destroy_process_group()
+
+''' trains a model with world_size CPU processes on this machine.  Each process trains on its own shard of the dataset
+with the gloo backend averaging the gradients, and gets threads_per_worker intra-op threads (by default the cores are
+split evenly).  One process per socket (or per NUMA node) usually scales best.
+batch_size in the config is per process, so the effective batch size is world_size times larger'''
+def launch(config, world_size, threads_per_worker=None):
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // world_size)
+    mp.spawn(_worker, args=(world_size, _free_port(), threads, config), nprocs=world_size, join=True)
@@ -0,0 +1,529 @@
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import ConcatDataset
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import constants as c
+from models.networks import architecture_spec, network_from_spec
+from models.checkpoint import read_checkpoint, save_model
+from models import class_maps
+from training.step import train_step, MetricAccumulator, PRECISIONS
+from training.distributed import ContiguousShardSampler, launch, shared_seed
+from training.activation_cache import cached_dataset, TrainableLayers
+from training.evaluation import AsyncEvaluator, EarlyStopping
+from training.checkpoints import CheckpointManager, latest_checkpoint
+from training.profiling import StepTimer, TimingLog, ProfilerWindow
+from training.one_vs_rest import OneVsRestLoss, OneVsRestDataset, OneVsRestSampler, dataset_labels, head_pos_weight
+from utilities.datasets import FeatureDataset, make_loader
+from utilities.feature_store import IMG_SIZE, open_features
+from utilities.preprocess_cache import pipeline_fingerprint
+from utilities.augmentation import NoiseAugmenter
+from utilities.activation_capture import ActivationRecorder
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'configs')
+
+# every config is merged over these defaults, see training/configs/ for complete examples
+DEFAULT_CONFIG = {
+    'name': 'model',
+    'architecture': 'alphabet',           # one of models.networks.ARCHITECTURES
+    'width': 1.0,                         # scales the number of channels of every conv layer
+    'train': [],                          # list of {"features", "labels", "start", "stop"} used in order
+    'validate': None,                     # {"features", "labels", "start", "stop"}
+    'optimizer': {'name': 'adam', 'lr': 0.001},
+    'loss': 'cross_entropy',              # 'one_vs_rest' for the multi-head architectures, see one_vs_rest.py
+    'one_vs_rest': None,                  # {"positive", "pos_fraction", "samples_per_epoch", "hard_negatives"} to
+                                          # train a class-vs-rest model on a multi-class dataset, see OneVsRestSampler
+    'schedule': {
+        'epochs': 40,
+        'batch_size': 50,
+        'eval_every': 300,                # test every eval_every training samples
+        'eval_size': 100,                 # number of validation samples used by each test
+        'save_epochs': [],                # save the model at the start of these epochs
+        'lr_step': None,                  # {"step_size", "gamma"} to decay the learning rate every step_size epochs
+    },
+    'evaluation': {
+        'every': None,                    # score the full validation set every this many epochs, in the background
+        'batch_size': 500,
+        'metric': 'loss',                 # 'loss' or 'accuracy', used for early stopping and the best checkpoint
+        'patience': None,                 # stop after this many evaluations without improvement
+        'min_delta': 0.0,                 # smallest change that counts as an improvement
+        'best_output': None,              # file in trained_models/ the weights of the best evaluation are saved to
+    },
+    'checkpoint': {
+        'dir': None,                      # defaults to trained_models/checkpoints/<name>
+        'every_steps': None,              # save a resumable checkpoint every this many batches
+        'every_minutes': None,            # and/or every this many minutes
+        'keep': 3,                        # number of checkpoints kept
+    },
+    'timing': {
+        'every': None,                    # record throughput and time per phase every this many batches
+        'output': None,                   # defaults to <name>_timing.jsonl, a .csv file name writes csv instead
+        'profile_start': None,            # run torch.profiler from this step...
+        'profile_steps': 5,               # ...for this many steps
+        'profile_trace': None,            # chrome trace file, defaults to <name>_trace.json
+    },
+    'resume': False,                      # true to resume from the newest checkpoint, or the path of a checkpoint
+    'loader': {'workers': 2, 'prefetch_factor': 4, 'shuffle': False},
+    'init_checkpoint': None,              # file in trained_models/ to continue training from
+    'freeze_layers': 0,                   # freeze the first freeze_layers children when continuing from a checkpoint
+    'cache_frozen': False,                # compute the frozen conv layers once and train the rest from their cached output
+    'augment_noise': False,               # add noise to the training batches on the fly
+    'capture_activations': False,         # record activations for show_activations, true or ACTIVATION_CAPTURE keys
+    'output': None,                       # file in trained_models/ the trained weights are saved to
+    'log': None,                          # log file, defaults to <name>.log
+    'device': 'auto',
+    'precision': 'fp32',                  # 'bf16' trains with bfloat16 autocast and float32 weights, see step.py
+    'seed': None,                         # seed torch and numpy for reproducible runs
+    'distributed': {'world_size': 1, 'threads_per_worker': None}, # data parallel CPU training, see distributed.py
+}
+
+# what capture_activations records when it is true: the layers (module names), every how many batches and how many
+# records of each layer are kept.  A dictionary in the config overrides some of them
+ACTIVATION_CAPTURE = {'layers': ['conv1', 'conv2'], 'every': 100, 'capacity': 8}
+# files show_activations reads, other layers are saved to visualize_activation_<layer>.npy
+ACTIVATION_FILES = {'conv1': 'visualize_activation1.npy', 'conv2': 'visualize_activation2.npy'}
+
+OPTIMIZERS = {'adam': optim.Adam, 'sgd': optim.SGD}
+
+''' merges override into base, recursing into dictionaries, and returns the result as a new dictionary'''
+def merge_config(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+''' loads a json config (a path, or the name of a file in training/configs) merged over DEFAULT_CONFIG'''
+def load_config(path, overrides=None):
+    if not os.path.exists(path) and os.path.exists(os.path.join(CONFIG_DIR, path + '.json')):
+        path = os.path.join(CONFIG_DIR, path + '.json')
+    with open(path) as f:
+        config = merge_config(DEFAULT_CONFIG, json.load(f))
+    if overrides:
+        config = merge_config(config, overrides)
+    return config
+
+def get_device(name='auto'):
+    if name != 'auto':
+        return torch.device(name)
+    # Check for GPU, if no GPU, use CPU
+    if torch.cuda.is_available():
+        print("Running on the GPU")
+        return torch.device("cuda:0")
+    print("Running on the CPU")
+    return torch.device("cpu")
+
+def build_dataset(spec):
+    return FeatureDataset(spec['features'], spec['labels'], start=spec.get('start', 0), stop=spec.get('stop'))
+
+def concat_datasets(sets):
+    return sets[0] if len(sets) == 1 else ConcatDataset(sets)
+
+''' builds the training dataset from the list of file specs in config['train']'''
+def build_train_dataset(config):
+    return concat_datasets([build_dataset(spec) for spec in config['train']])
+
+''' returns the preprocessing fingerprint (see utilities.preprocess_cache.pipeline_fingerprint) of the training feature
+files, from the storage format of each file and the "noise" mode of its spec (False when not given), to be saved with
+the model.  Files that went through different pipelines give the list of their fingerprints'''
+def preprocessing_fingerprint(config):
+    fingerprints = []
+    for spec in config['train']:
+        dtype = str(open_features(spec['features']).dtype)
+        fingerprint = pipeline_fingerprint(spec.get('noise', False), IMG_SIZE, dtype)
+        if fingerprint not in fingerprints:
+            fingerprints.append(fingerprint)
+    return fingerprints[0] if len(fingerprints) == 1 else fingerprints
+
+''' returns how many conv layers are frozen and can be cached with cache_frozen, checking the config allows it'''
+def cached_layers(config, net):
+    if not config['init_checkpoint'] or config['freeze_layers'] <= 0:
+        raise ValueError('cache_frozen needs an init_checkpoint and freeze_layers > 0')
+    if config['augment_noise'] or config['capture_activations']:
+        raise ValueError('augment_noise and capture_activations work on the input images, not with cache_frozen')
+    return min(config['freeze_layers'], net.num_convs)
+
+''' builds the network, loads the initial checkpoint and freezes the first freeze_layers children if asked to'''
+def build_model(config, device):
+    model = network_from_spec(architecture_spec(config['architecture'], config['width'])).to(device)
+    if config['init_checkpoint']:
+        print("previous model loaded")
+        checkpoint = read_checkpoint(os.path.join(c.MODEL_SAVE_PATH, config['init_checkpoint']), map_location=device)
+        model.load_state_dict(checkpoint['state_dict'])
+        for lyr, child in enumerate(model.children(), 1):
+            # freezes layers 1: FREEZE_LAYERS in the model
+            if lyr <= config['freeze_layers']:
+                for param in child.parameters():
+                    param.requires_grad = False
+    return model
+
+''' returns the loss function of the config.  The one-vs-rest loss weighs the heads by the class balance of dataset'''
+def build_loss(config, dataset, num_classes, device):
+    if config['loss'] == 'cross_entropy':
+        return nn.CrossEntropyLoss()
+    if config['loss'] == 'one_vs_rest':
+        return OneVsRestLoss(head_pos_weight(dataset_labels(dataset), num_classes)).to(device)
+    raise ValueError('unknown loss ' + str(config['loss']))
+
+def build_optimizer(config, model):
+    settings = dict(config['optimizer'])
+    return OPTIMIZERS[settings.pop('name')](model.parameters(), **settings)
+
+# the numpy random state with its key array as a tensor, so checkpoints only hold tensors and plain python values
+def numpy_rng_state():
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return name, torch.from_numpy(keys.astype(np.int64)), pos, has_gauss, cached_gaussian
+
+def set_numpy_rng_state(state):
+    name, keys, pos, has_gauss, cached_gaussian = state
+    np.random.set_state((name, keys.numpy().astype(np.uint32), pos, has_gauss, cached_gaussian))
+
+''' trains one model as described by a config.  This is the loop that used to be copied into every training script.
+When it is one of world_size data parallel processes (see distributed.py) it trains on its shard of the data and only
+rank 0 tests, logs and saves'''
+class Trainer:
+    def __init__(self, config, device=None, rank=0, world_size=1):
+        self.config = config
+        self.schedule = config['schedule']
+        self.device = device if device is not None else get_device(config['device'])
+        self.rank = rank
+        self.world_size = world_size
+        self.is_main = rank == 0
+        self.precision = config['precision']
+        self.model_name = f"{config['name']}-{int(time.time())}" # time stamp so the log keeps a history of runs
+        self.log_file = config['log'] or config['name'] + '.log'
+        if config['seed'] is not None:
+            torch.manual_seed(config['seed'] + rank)
+            np.random.seed(config['seed'] + rank)
+
+        # self.net is the network itself, self.layers the part of it the batches go through (everything after the cached
+        # frozen layers with cache_frozen) and self.model what the training step calls (the DDP wrapper if distributed)
+        self.net = build_model(config, self.device)
+        self.skip = cached_layers(config, self.net) if config['cache_frozen'] else 0
+        self.layers = TrainableLayers(self.net, self.skip) if self.skip else self.net
+        self.model = self.layers
+        if world_size > 1:
+            self.model = DistributedDataParallel(self.layers)
+        self.optimizer = build_optimizer(config, self.net)
+        self.scheduler = None
+        if self.schedule['lr_step']:
+            self.scheduler = optim.lr_scheduler.StepLR(self.optimizer, **self.schedule['lr_step'])
+
+        if self.skip:
+            self.train_set, self.validate_set = self.build_cached_datasets()
+        else:
+            self.train_set = build_train_dataset(config)
+            self.validate_set = build_dataset(config['validate'])
+        one_vs_rest = config['one_vs_rest']
+        if one_vs_rest:
+            self.train_set = OneVsRestDataset(self.train_set, one_vs_rest['positive'])
+            self.validate_set = OneVsRestDataset(self.validate_set, one_vs_rest['positive'])
+        self.preprocessing = preprocessing_fingerprint(config)
+        if self.is_main:
+            print(len(self.train_set))
+            print(len(self.validate_set))
+        self.loss_fn = build_loss(config, self.train_set, self.net.fc2.out_features, self.device)
+        loader = config['loader']
+        # the sampler (rather than the DataLoader) shuffles, so the order of an epoch can be reproduced on resume
+        # and all the processes use one seed so their shards of the epoch are disjoint
+        seed = shared_seed(config['seed'], world_size)
+        if one_vs_rest:
+            self.sampler = OneVsRestSampler(self.train_set.labels, one_vs_rest['positive'],
+                                            one_vs_rest.get('pos_fraction', 0.5), one_vs_rest.get('samples_per_epoch'),
+                                            one_vs_rest.get('hard_negatives'), world_size, rank, seed)
+        else:
+            self.sampler = ContiguousShardSampler(self.train_set, world_size, rank, shuffle=loader['shuffle'],
+                                                  seed=seed)
+        self.train_loader = make_loader(self.train_set, self.schedule['batch_size'],
+                                        workers=loader['workers'], prefetch_factor=loader['prefetch_factor'],
+                                        augment=NoiseAugmenter() if config['augment_noise'] else None,
+                                        sampler=self.sampler)
+        self.evaluator = None
+        evaluation = config['evaluation']
+        if evaluation['every'] and self.is_main:
+            best_output = evaluation['best_output']
+            self.evaluator = AsyncEvaluator(
+                self.net, self.validate_set, self.loss_fn, self.device, skip=self.skip,
+                batch_size=evaluation['batch_size'], precision=self.precision,
+                stopping=EarlyStopping(evaluation['patience'], evaluation['min_delta'], evaluation['metric']),
+                save_best=(lambda weights: self.save_model(best_output, weights)) if best_output else None)
+        self.eval_log_file = os.path.splitext(self.log_file)[0] + '_eval.log'
+        timing = config['timing']
+        self.timer = StepTimer(self.device, enabled=bool(timing['every']) and self.is_main)
+        self.timing_log = TimingLog(timing['output'] or config['name'] + '_timing.jsonl')
+        self.profiler = ProfilerWindow(timing['profile_start'] if self.is_main else None, timing['profile_steps'],
+                                       timing['profile_trace'] or config['name'] + '_trace.json')
+        self.activations = None
+        if config['capture_activations'] and self.is_main:
+            capture = ACTIVATION_CAPTURE
+            if isinstance(config['capture_activations'], dict):
+                capture = merge_config(capture, config['capture_activations'])
+            self.activations = ActivationRecorder(self.net, capture['layers'], capture['every'], capture['capacity'])
+
+        # training position: the epoch, the batch within it and the number of steps taken
+        self.epoch, self.batch, self.step = 0, 0, 0
+        checkpoint = config['checkpoint']
+        self.checkpoint_dir = checkpoint['dir'] or os.path.join(c.MODEL_SAVE_PATH, 'checkpoints', config['name'])
+        self.checkpoints = None
+        if self.is_main and (checkpoint['every_steps'] or checkpoint['every_minutes']):
+            self.checkpoints = CheckpointManager(self.checkpoint_dir, checkpoint['every_steps'],
+                                                 checkpoint['every_minutes'], checkpoint['keep'])
+        if config['resume']:
+            self.resume(config['resume'])
+
+    ''' returns the training and validation datasets of cached frozen layer outputs.  Rank 0 builds any missing cache
+    files while the other processes wait for it'''
+    def build_cached_datasets(self):
+        checkpoint = os.path.join(c.MODEL_SAVE_PATH, self.config['init_checkpoint'])
+        def load(spec):
+            return cached_dataset(self.net, self.config['architecture'], checkpoint, self.skip, spec, self.device)
+
+        if not self.is_main:
+            dist.barrier()
+        train_set = concat_datasets([load(spec) for spec in self.config['train']])
+        validate_set = load(self.config['validate'])
+        if self.is_main and self.world_size > 1:
+            dist.barrier()
+        return train_set, validate_set
+
+    '''tests accuracy and loss on a random slice of the validation data.
+    # size: the amount of test instances to use.
+    # returns the accuracy and loss for the test data being fed through the model'''
+    def test(self, size):
+        random_start = np.random.randint(max(1, len(self.validate_set) - size))
+        X, y = self.validate_set.get_batch(random_start, random_start + size)
+        with torch.no_grad():
+            loss, correct = train_step(self.layers, self.loss_fn, X.to(self.device), y.to(self.device),
+                                       precision=self.precision)
+        return correct.item() / len(y), loss.item()
+
+    ''' saves the weights of the network (or a state dict of it) to a file in trained_models/, with the description of
+    the network and its classes (see models/checkpoint.py)'''
+    def save_model(self, file, weights=None):
+        one_vs_rest = self.config['one_vs_rest']
+        class_map = class_maps.one_vs_rest(one_vs_rest['positive']) if one_vs_rest else None
+        save_model(weights if weights is not None else self.net, os.path.join(c.MODEL_SAVE_PATH, file),
+                   architecture_spec(self.config['architecture'], self.config['width']), class_map,
+                   preprocessing=self.preprocessing)
+
+    ''' saves the model to the output file in trained_models/'''
+    def save(self):
+        if self.config['output'] and self.is_main:
+            self.save_model(self.config['output'])
+
+    ''' returns everything needed to continue training from the current position'''
+    def state_dict(self):
+        state = {
+            'model': self.net.state_dict(),
+            'optimizer': self.optimizer.state_dict(),
+            'epoch': self.epoch,
+            'batch': self.batch,
+            'step': self.step,
+            'sampler_seed': self.sampler.seed,
+            'rng': {'torch': torch.get_rng_state(), 'numpy': numpy_rng_state(), 'python': random.getstate()},
+        }
+        if self.scheduler is not None:
+            state['scheduler'] = self.scheduler.state_dict()
+        if self.evaluator is not None:
+            state['stopping'] = {'best': self.evaluator.stopping.best,
+                                 'bad_evaluations': self.evaluator.stopping.bad_evaluations}
+        return state
+
+    def load_state_dict(self, state):
+        self.net.load_state_dict(state['model'])
+        self.optimizer.load_state_dict(state['optimizer'])
+        self.epoch, self.batch, self.step = state['epoch'], state['batch'], state['step']
+        self.sampler.seed = state['sampler_seed']
+        torch.set_rng_state(state['rng']['torch'])
+        set_numpy_rng_state(state['rng']['numpy'])
+        random.setstate(state['rng']['python'])
+        if self.scheduler is not None and 'scheduler' in state:
+            self.scheduler.load_state_dict(state['scheduler'])
+        if self.evaluator is not None and 'stopping' in state:
+            self.evaluator.stopping.best = state['stopping']['best']
+            self.evaluator.stopping.bad_evaluations = state['stopping']['bad_evaluations']
+
+    ''' loads a checkpoint to continue training from.  resume is True for the newest checkpoint in the checkpoint
+    directory, or the path of a checkpoint'''
+    def resume(self, resume):
+        path = resume
+        if resume is True:
+            path = latest_checkpoint(self.checkpoint_dir)
+        if path is None:
+            print('no checkpoint to resume from in ' + self.checkpoint_dir + ', starting from the beginning')
+            return
+        print('resuming from ' + path)
+        self.load_state_dict(torch.load(path, map_location='cpu'))
+        if self.checkpoints is not None:
+            self.checkpoints.last_step = self.step
+
+    ''' appends the finished full validation results to the eval log'''
+    def log_evaluations(self, init_time):
+        results = self.evaluator.poll() if self.evaluator is not None else []
+        if results:
+            with open(self.eval_log_file, "a+") as f:
+                for epoch, accuracy, loss in results:
+                    print(f"epoch {epoch} validation accuracy {round(accuracy, 5)} loss {round(loss, 5)}")
+                    f.write(f"{self.model_name}, {round(time.time()-init_time, 4)}, {int(epoch)}, {round(accuracy, 5)}, {round(loss, 5)}\n")
+
+    ''' writes the timing of the steps since the last call to the timing log'''
+    def log_timing(self, epoch):
+        record = {'model': self.model_name, 'epoch': epoch, 'step': self.step}
+        record.update(self.timer.report())
+        self.timing_log.write(record)
+        self.timer.reset()
+
+    ''' returns True when early stopping says training should end.  Rank 0 makes the call for all processes'''
+    def stop_early(self):
+        stop = self.evaluator is not None and self.evaluator.should_stop
+        if self.world_size > 1:
+            flag = torch.tensor([int(stop)])
+            dist.broadcast(flag, 0)
+            stop = bool(flag.item())
+        return stop
+
+    ''' runs the training schedule, logging test/train accuracy and loss every eval_every samples.  Returns the
+    accuracy and loss of the last test'''
+    def train(self):
+        batch_size, eval_every = self.schedule['batch_size'], self.schedule['eval_every']
+        train_metrics = MetricAccumulator(self.device)
+        test_accuracy, test_loss = 0.0, 0.0
+        f = open(self.log_file, "a+") if self.is_main else None
+        try:
+            init_time = time.time()
+            for epoch in range(self.epoch, self.schedule['epochs']):
+                self.epoch = epoch
+                if self.is_main:
+                    print(epoch)
+                if epoch in self.schedule['save_epochs'] and self.batch == 0:
+                    # save progress periodically in case we run out of time on the gpu
+                    self.save()
+                # a resumed run skips the batches of this epoch it already trained on
+                self.sampler.set_epoch(epoch, start=self.batch * batch_size)
+
+                self.model.train()
+                step_start = time.perf_counter()
+                for i, (batch_x, batch_y) in enumerate(self.train_loader, self.batch):
+                    self.timer.add('data', time.perf_counter() - step_start)
+                    with self.timer.phase('h2d'):
+                        batch_x = batch_x.to(self.device, non_blocking=True)
+                        batch_y = batch_y.to(self.device, non_blocking=True)
+                    loss, correct = train_step(self.model, self.loss_fn, batch_x, batch_y, self.optimizer,
+                                               precision=self.precision, timer=self.timer)
+                    train_metrics.update(loss, correct, len(batch_y))
+                    self.batch, self.step = i + 1, self.step + 1
+                    self.timer.end_step(len(batch_y), time.perf_counter() - step_start)
+                    self.profiler.step(self.step)
+                    if self.timer.enabled and self.step % self.config['timing']['every'] == 0:
+                        self.log_timing(epoch)
+                    if self.checkpoints is not None and self.checkpoints.due(self.step):
+                        self.checkpoints.save(self.state_dict(), self.step)
+
+                    if self.is_main and i * batch_size % eval_every == 0:
+                        self.net.eval()
+                        test_accuracy, test_loss = self.test(self.schedule['eval_size'])
+                        self.net.train()
+                        train_accuracy, train_loss = train_metrics.compute()
+                        train_metrics.reset()
+                        f.write(
+                            f"{self.model_name}, {round(time.time()-init_time, 4)}, {int(epoch)}, {round(test_accuracy, 5)}, {round(test_loss, 5)}, {round(train_accuracy, 5)}, {round(train_loss, 5)}\n")
+                    step_start = time.perf_counter()
+                self.epoch, self.batch = epoch + 1, 0
+                if self.scheduler is not None:
+                    self.scheduler.step()
+
+                if self.evaluator is not None and (epoch + 1) % self.config['evaluation']['every'] == 0:
+                    self.evaluator.submit(self.net, epoch)
+                self.log_evaluations(init_time)
+                if self.stop_early():
+                    if self.is_main:
+                        print('no improvement in the last ' + str(self.config['evaluation']['patience']) +
+                              ' evaluations, stopping early')
+                    break
+        finally:
+            if f is not None:
+                f.close()
+            if self.evaluator is not None:
+                self.evaluator.close()
+            if self.checkpoints is not None:
+                self.checkpoints.close()
+            self.profiler.close()
+        self.log_evaluations(init_time)
+
+        self.save()
+        if self.activations is not None:
+            self.activations.save({layer: ACTIVATION_FILES.get(layer, 'visualize_activation_' + layer + '.npy')
+                                   for layer in self.activations.layers})
+        return test_accuracy, test_loss
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='train a model from a json config')
+    parser.add_argument('--config', required=True,
+                        help='path to a json config, or the name of one in training/configs (e.g. alphabet)')
+    parser.add_argument('--epochs', type=int, help='override the number of epochs')
+    parser.add_argument('--lr', type=float, help='override the learning rate')
+    parser.add_argument('--batch-size', type=int, help='override the batch size')
+    parser.add_argument('--device', help='cpu, cuda:0, ... (default: the GPU if there is one)')
+    parser.add_argument('--precision', choices=sorted(PRECISIONS),
+                        help='fp32, or bf16 to train with bfloat16 autocast (fastest on AVX512-BF16/AMX CPUs)')
+    parser.add_argument('--cache-frozen', action='store_true',
+                        help='train the layers after the frozen ones from a cache of the frozen layer outputs')
+    parser.add_argument('--timing', type=int, metavar='N',
+                        help='record images/s, time per phase and step time percentiles every N batches')
+    parser.add_argument('--profile', type=int, metavar='STEP',
+                        help='export a torch.profiler trace of the steps after STEP')
+    parser.add_argument('--resume', nargs='?', const=True,
+                        help='continue from the newest checkpoint of this config, or from the given checkpoint file')
+    parser.add_argument('--world-size', type=int,
+                        help='train with this many data parallel CPU processes (gloo), e.g. one per socket')
+    return parser.parse_args(argv)
+
+''' returns the config overrides given on the command line'''
+def cli_overrides(args):
+    overrides = {'schedule': {}, 'optimizer': {}}
+    if args.epochs is not None:
+        overrides['schedule']['epochs'] = args.epochs
+    if args.batch_size is not None:
+        overrides['schedule']['batch_size'] = args.batch_size
+    if args.lr is not None:
+        overrides['optimizer']['lr'] = args.lr
+    if args.device is not None:
+        overrides['device'] = args.device
+    if args.precision is not None:
+        overrides['precision'] = args.precision
+    if args.cache_frozen:
+        overrides['cache_frozen'] = True
+    if args.timing is not None:
+        overrides['timing'] = {'every': args.timing}
+    if args.profile is not None:
+        overrides.setdefault('timing', {})['profile_start'] = args.profile
+    if args.resume is not None:
+        overrides['resume'] = args.resume
+    if args.world_size is not None:
+        overrides['distributed'] = {'world_size': args.world_size}
+    return overrides
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args.config, cli_overrides(args))
+    distributed = config['distributed']
+    if distributed['world_size'] > 1:
+        launch(config, distributed['world_size'], distributed['threads_per_worker'])
+    else:
+        Trainer(config).train()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import copy
+import queue
+import threading
+import torch
+
+from training.step import train_step, MetricAccumulator
+from training.activation_cache import TrainableLayers
+
+''' scores model on the whole of dataset (a FeatureDataset or ActivationDataset) in batches of batch_size, returns the
+accuracy and mean loss as floats'''
+def evaluate(model, dataset, loss_fn, device, batch_size=500, precision='fp32'):
+    metrics = MetricAccumulator(device)
+    model.eval()
+    with torch.no_grad():
+        for start in range(0, len(dataset), batch_size):
+            X, y = dataset.get_batch(start, min(start + batch_size, len(dataset)))
+            loss, correct = train_step(model, loss_fn, X.to(device), y.to(device), precision=precision)
+            metrics.update(loss, correct, len(y))
+    return metrics.compute()
+
+''' stops training when the validation metric has not improved by more than min_delta for patience evaluations in a
+row.  metric is 'loss' (lower is better) or 'accuracy'.  patience=None never stops, it only tracks the best result'''
+class EarlyStopping:
+    def __init__(self, patience=None, min_delta=0.0, metric='loss'):
+        if metric not in ('loss', 'accuracy'):
+            raise ValueError('metric must be loss or accuracy, not ' + str(metric))
+        self.patience = patience
+        self.min_delta = min_delta
+        self.metric = metric
+        self.best = None
+        self.bad_evaluations = 0
+
+    ''' records an evaluation result and returns True if it is the best so far'''
+    def update(self, accuracy, loss):
+        value = loss if self.metric == 'loss' else -accuracy
+        if self.best is None or value < self.best - self.min_delta:
+            self.best = value
+            self.bad_evaluations = 0
+            return True
+        self.bad_evaluations += 1
+        return False
+
+    @property
+    def should_stop(self):
+        return self.patience is not None and self.bad_evaluations >= self.patience
+
+''' evaluates snapshots of the weights of net on the full validation set in a background thread while training goes on.
+submit() copies the current weights (a few MB for these networks) and returns immediately; if the previous snapshot is
+still waiting its turn it is replaced, so evaluation never falls more than one snapshot behind.
+Finished results are handed to the EarlyStopping policy, and the weights of the best one are passed to save_best if it
+is given.  poll() returns the results finished since the last call as (epoch, accuracy, loss) tuples.
+skip is the number of cached frozen conv layers when dataset holds cached activations (see activation_cache.py)'''
+class AsyncEvaluator:
+    def __init__(self, net, dataset, loss_fn, device, skip=0, batch_size=500, precision='fp32', stopping=None,
+                 save_best=None):
+        self.net = copy.deepcopy(net)
+        self.model = TrainableLayers(self.net, skip) if skip else self.net
+        self.dataset = dataset
+        self.loss_fn = loss_fn
+        self.device = device
+        self.batch_size = batch_size
+        self.precision = precision
+        self.stopping = stopping if stopping is not None else EarlyStopping()
+        self.save_best = save_best
+        self.results = []
+        self.error = None
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    ''' queues an evaluation of the current weights of net, tagged with epoch'''
+    def submit(self, net, epoch):
+        self._raise_error()
+        snapshot = {k: v.detach().clone() for k, v in net.state_dict().items()}
+        try:
+            self._jobs.get_nowait() # drop the older snapshot nobody has started on yet
+        except queue.Empty:
+            pass
+        self._jobs.put((epoch, snapshot))
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            epoch, snapshot = job
+            try:
+                self.net.load_state_dict(snapshot)
+                accuracy, loss = evaluate(self.model, self.dataset, self.loss_fn, self.device, self.batch_size,
+                                          self.precision)
+                if self.stopping.update(accuracy, loss) and self.save_best is not None:
+                    self.save_best(snapshot)
+                with self._lock:
+                    self.results.append((epoch, accuracy, loss))
+            except Exception as e:
+                self.error = e
+                return
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError('evaluation failed') from self.error
+
+    ''' returns the (epoch, accuracy, loss) results finished since the last call'''
+    def poll(self):
+        self._raise_error()
+        with self._lock:
+            results, self.results = self.results, []
+        return results
+
+    @property
+    def should_stop(self):
+        return self.stopping.should_stop
+
+    ''' waits for the queued evaluation to finish and stops the thread'''
+    def close(self):
+        if self._thread.is_alive():
+            self._jobs.put(None)
+            self._thread.join()
+        self._raise_error()
@@ -0,0 +1,124 @@
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import ConcatDataset, Dataset, Sampler
+
+from utilities.labels import class_histogram, one_vs_rest, to_classes
+
+''' returns the class numbers of every sample of a dataset (a FeatureDataset, ActivationDataset or a ConcatDataset of
+them)'''
+def dataset_labels(dataset):
+    if isinstance(dataset, ConcatDataset):
+        return np.concatenate([dataset_labels(d) for d in dataset.datasets])
+    return np.asarray(dataset.labels)
+
+''' returns the weight of the positive samples of each head so that, for every head, the positives and the negatives
+contribute equally to the loss.  A head whose class has no samples (J and Z in the alphabet) gets weight 1'''
+def head_pos_weight(labels, num_heads):
+    positives = class_histogram(labels, num_heads).astype(np.float64)
+    negatives = len(labels) - positives
+    weight = np.where(positives > 0, negatives / np.maximum(positives, 1), 1.0)
+    return torch.tensor(weight, dtype=torch.float32)
+
+''' binary cross entropy of every head of a MultiHeadNet against its one-vs-rest target (1 for the head of the label,
+0 for all the others), with the positives of each head weighted by pos_weight (see head_pos_weight).  Takes class
+numbers like nn.CrossEntropyLoss so the training step does not need to know which kind of model it trains'''
+class OneVsRestLoss(nn.Module):
+    def __init__(self, pos_weight):
+        super().__init__()
+        self.register_buffer('pos_weight', pos_weight)
+
+    def forward(self, logits, y):
+        targets = F.one_hot(y, logits.shape[1]).to(logits.dtype)
+        return F.binary_cross_entropy_with_logits(logits.float(), targets.float(), pos_weight=self.pos_weight)
+
+''' returns the probabilities of every one-vs-rest head of a MultiHeadNet for a batch of images, an n x classes
+array'''
+def predict_heads(model, X):
+    model.eval()
+    with torch.no_grad():
+        return torch.sigmoid(model(X).float()).cpu().numpy()
+
+''' returns the accuracy, precision and recall of each head on its one-vs-rest task, as arrays with one value per
+class.  scores are the probabilities from predict_heads, y the class numbers and a head says "class i" when its
+probability is above threshold'''
+def head_metrics(scores, y, threshold=0.5):
+    predicted = scores > threshold
+    actual = np.asarray(y)[:, None] == np.arange(scores.shape[1])
+    true_positives = np.sum(predicted & actual, axis=0)
+    accuracy = np.mean(predicted == actual, axis=0)
+    precision = true_positives / np.maximum(np.sum(predicted, axis=0), 1)
+    recall = true_positives / np.maximum(np.sum(actual, axis=0), 1)
+    return accuracy, precision, recall
+
+''' one-vs-rest view of a multi-class dataset (a FeatureDataset, ActivationDataset or a ConcatDataset of them): the
+images are read from the master dataset and the labels are ONE (0) for class positive and REST (1) for everything else,
+like the labels of the one-vs-rest feature files.  labels are the original class numbers, for OneVsRestSampler'''
+class OneVsRestDataset(Dataset):
+    def __init__(self, dataset, positive):
+        self.dataset = dataset
+        self.positive = positive
+        self.labels = dataset_labels(dataset)
+        self.targets = one_vs_rest(self.labels, positive).astype(np.int64)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, i):
+        x, _ = self.dataset[i]
+        return x, int(self.targets[i])
+
+    def get_batch(self, start, stop):
+        x, _ = self.dataset.get_batch(start, stop)
+        return x, torch.from_numpy(self.targets[start:stop])
+
+''' draws the samples of every epoch of one-vs-rest training from a multi-class dataset, so a detector for a new class
+only needs its class number instead of a dataset of its own.  pos_fraction of the samples are positives (repeated if
+there are not enough of them) and the rest are negatives, drawn with probability proportional to
+negative_weights[class] (1 for classes not in it) so look-alike classes can be shown more often as hard negatives.
+num_samples defaults to as many samples as it takes to show every positive once per epoch.
+Like ContiguousShardSampler the draw only depends on seed and the epoch, set_epoch(epoch, start) skips samples of a
+resumed epoch, and with num_replicas > 1 every process gets a disjoint part of the epoch.  That needs the same seed in
+every process (see training.distributed.shared_seed), so seed cannot be None then'''
+class OneVsRestSampler(Sampler):
+    def __init__(self, labels, positive, pos_fraction=0.5, num_samples=None, negative_weights=None, num_replicas=1,
+                 rank=0, seed=0):
+        if seed is None and num_replicas > 1:
+            raise ValueError('the processes of distributed one-vs-rest training need a shared seed')
+        classes = to_classes(labels, np.intp)
+        self.positives = np.flatnonzero(classes == positive)
+        self.negatives = np.flatnonzero(classes != positive)
+        if len(self.positives) == 0 or len(self.negatives) == 0:
+            raise ValueError('one-vs-rest training of class ' + str(positive) + ' needs positives and negatives')
+        weights = np.ones(len(self.negatives))
+        for cls, weight in (negative_weights or {}).items():
+            weights[classes[self.negatives] == int(cls)] = weight
+        self.negative_p = weights / weights.sum()
+
+        self.total = num_samples or int(round(len(self.positives) / pos_fraction))
+        self.num_positives = int(round(self.total * pos_fraction))
+        self.num_samples = self.total // num_replicas
+        self.rank = rank
+        self.seed = seed or 0
+        self.epoch = 0
+        self.skip = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.skip = start
+
+    def __len__(self):
+        return self.num_samples - self.skip
+
+    def __iter__(self):
+        rng = np.random.RandomState(self.seed + self.epoch)
+        num_negatives = self.total - self.num_positives
+        positives = rng.choice(self.positives, self.num_positives,
+                               replace=self.num_positives > len(self.positives))
+        negatives = rng.choice(self.negatives, num_negatives, replace=num_negatives > len(self.negatives),
+                               p=self.negative_p)
+        indices = np.concatenate([positives, negatives])
+        rng.shuffle(indices)
+        shard = indices[self.rank * self.num_samples:(self.rank + 1) * self.num_samples]
+        return iter(shard[self.skip:].tolist())
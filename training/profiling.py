@@ -0,0 +1,124 @@
+import contextlib
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+import numpy as np
+import torch
+
+try:
+    import resource # not available on windows, peak_rss_mb is reported as None there
+except ImportError:
+    resource = None
+
+PHASES = ('data', 'h2d', 'forward', 'backward', 'optimizer')
+PERCENTILES = (50, 90, 99)
+
+''' returns the peak resident set size of this process in MB, or None where it cannot be measured'''
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # kilobytes on linux
+
+''' accumulates the time training steps spend in each phase (data loading, host to device copy, forward, backward and
+optimizer step) and the total time of each step.  On the GPU every phase synchronizes the device at its boundaries so
+the times are real, which slows training down a little; a disabled timer does nothing at all'''
+class StepTimer:
+    def __init__(self, device, enabled=True):
+        self.enabled = enabled
+        self.sync = enabled and torch.device(device).type == 'cuda'
+        self.reset()
+
+    def reset(self):
+        self.phases = defaultdict(float)
+        self.step_times = []
+        self.images = 0
+        self.start = time.perf_counter()
+
+    def _synchronize(self):
+        if self.sync:
+            torch.cuda.synchronize()
+
+    ''' context manager timing the code inside it as phase name'''
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        self._synchronize()
+        start = time.perf_counter()
+        yield
+        self._synchronize()
+        self.phases[name] += time.perf_counter() - start
+
+    ''' adds seconds measured elsewhere to phase name'''
+    def add(self, name, seconds):
+        if self.enabled:
+            self.phases[name] += seconds
+
+    ''' records the end of a step over n images that took seconds in total'''
+    def end_step(self, n, seconds):
+        if self.enabled:
+            self.step_times.append(seconds)
+            self.images += n
+
+    ''' returns the throughput, time per phase, step time percentiles and peak memory since the last reset'''
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        record = {'steps': len(self.step_times), 'images': self.images, 'seconds': round(elapsed, 4),
+                  'images_per_s': round(self.images / elapsed, 2) if elapsed > 0 else 0.0}
+        for name in PHASES:
+            record[name + '_s'] = round(self.phases[name], 4)
+        step_times = np.array(self.step_times) * 1000 if self.step_times else np.zeros(1)
+        for p in PERCENTILES:
+            record[f'step_ms_p{p}'] = round(float(np.percentile(step_times, p)), 3)
+        record['peak_rss_mb'] = peak_rss_mb()
+        return record
+
+''' appends records (dictionaries with the same keys) to a .jsonl file, or to a .csv file with a header row'''
+class TimingLog:
+    def __init__(self, path):
+        self.path = path
+        self.csv = os.path.splitext(path)[1].lower() == '.csv'
+
+    def write(self, record):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a+', newline='') as f:
+            if self.csv:
+                writer = csv.DictWriter(f, fieldnames=list(record))
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(record)
+            else:
+                f.write(json.dumps(record) + '\n')
+
+''' runs torch.profiler over steps start+1..start+steps and exports a chrome trace (viewable in chrome://tracing or
+perfetto) to trace_path when the window ends.  start=None disables it'''
+class ProfilerWindow:
+    def __init__(self, start, steps, trace_path):
+        self.start = start
+        self.stop = None if start is None else start + steps
+        self.trace_path = trace_path
+        self.profiler = None
+
+    ''' call after every step with the number of steps taken so far'''
+    def step(self, step):
+        if self.start is None:
+            return
+        if step == self.start and self.profiler is None:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self.profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+            self.profiler.__enter__()
+        elif step == self.stop:
+            self.close()
+
+    def close(self):
+        if self.profiler is not None:
+            self.profiler.__exit__(None, None, None)
+            self.profiler.export_chrome_trace(self.trace_path)
+            print('profiler trace written to ' + self.trace_path)
+            self.profiler = None
+            self.start = None
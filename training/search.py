@@ -0,0 +1,148 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import constants as c
+from training.engine import CONFIG_DIR, Trainer, load_config, merge_config
+from training.evaluation import evaluate
+from training.checkpoints import save_atomic
+from utilities.precision_report import print_report
+
+SEARCH_DIR = os.path.join(CONFIG_DIR, 'search')
+PARAMS = ('lr', 'batch_size', 'width', 'freeze_layers')
+
+# every search config is merged over these defaults, see training/configs/search/ for examples
+DEFAULT_SEARCH = {
+    'name': 'search',
+    'base': 'alphabet',                   # training config the trials start from
+    'space': {'lr': [0.001], 'batch_size': [50], 'width': [1.0], 'freeze_layers': [0]},
+    'trials': None,                       # number of random points of the space to try, None tries all of them
+    'min_epochs': 1,                      # epochs every trial trains for in the first round
+    'max_epochs': 9,                      # epochs the best trials train for in the last round
+    'eta': 3,                             # each round keeps the best 1/eta trials and trains them eta times longer
+    'metric': 'loss',                     # 'loss' or 'accuracy' on the full validation set
+    'parallel': 2,                        # trials trained at the same time
+    'threads_per_trial': None,            # defaults to the cores split evenly between the parallel trials
+    'seed': 0,
+    'dir': None,                          # logs, checkpoints and results, defaults to trained_models/search/<name>
+}
+
+''' loads a json search config (a path, or the name of a file in training/configs/search) merged over DEFAULT_SEARCH'''
+def load_search_config(path):
+    if not os.path.exists(path) and os.path.exists(os.path.join(SEARCH_DIR, path + '.json')):
+        path = os.path.join(SEARCH_DIR, path + '.json')
+    with open(path) as f:
+        return merge_config(DEFAULT_SEARCH, json.load(f))
+
+''' returns the points of the search space to try as dictionaries of PARAMS.  A network with another width cannot start
+from the checkpoint of the base config, so those points train from scratch with nothing frozen'''
+def make_trials(search, base):
+    space = search['space']
+    points = []
+    for values in itertools.product(*(space[p] for p in PARAMS)):
+        point = dict(zip(PARAMS, values))
+        if point['width'] != 1.0 or not base['init_checkpoint']:
+            point['freeze_layers'] = 0
+        if point not in points:
+            points.append(point)
+    if search['trials'] is not None and search['trials'] < len(points):
+        rng = np.random.RandomState(search['seed'])
+        points = [points[i] for i in sorted(rng.choice(len(points), search['trials'], replace=False))]
+    return points
+
+''' returns the training config of one trial'''
+def trial_config(base, point, name, directory):
+    overrides = {'name': name, 'optimizer': {'lr': point['lr']}, 'schedule': {'batch_size': point['batch_size']},
+                 'width': point['width'], 'freeze_layers': point['freeze_layers'], 'output': None,
+                 'log': os.path.join(directory, name + '.log'), 'evaluation': {'every': None},
+                 'checkpoint': {'every_steps': None, 'every_minutes': None}}
+    if point['width'] != 1.0:
+        overrides['init_checkpoint'] = None
+    return merge_config(base, overrides)
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+''' trains a trial up to epochs epochs (continuing from its checkpoint of the previous round if there is one), saves
+its checkpoint and returns its accuracy and loss on the full validation set and the time it took'''
+def run_trial(config, epochs, checkpoint):
+    config = merge_config(config, {'schedule': {'epochs': epochs},
+                                   'resume': checkpoint if os.path.exists(checkpoint) else False})
+    init_time = time.time()
+    trainer = Trainer(config)
+    trainer.train()
+    save_atomic(trainer.state_dict(), checkpoint)
+    accuracy, loss = evaluate(trainer.layers, trainer.validate_set, trainer.loss_fn, trainer.device,
+                              precision=trainer.precision)
+    return accuracy, loss, time.time() - init_time
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+''' runs a hyperparameter search with successive halving: every trial trains for min_epochs, then the best 1/eta of
+them continue for eta times as many epochs, and so on until max_epochs.  parallel trials run at the same time, each in
+its own process limited to an equal share of the cores.  They all memory map the same feature files, so the dataset is
+read from disk (and held in the page cache) once however many trials there are.
+Every round of every trial is a row of <dir>/results.csv, the rows of the last round are returned best first'''
+def run_search(search):
+    base = load_config(search['base'])
+    directory = search['dir'] or os.path.join(c.MODEL_SAVE_PATH, 'search', search['name'])
+    os.makedirs(directory, exist_ok=True)
+    threads = search['threads_per_trial'] or max(1, (os.cpu_count() or 1) // search['parallel'])
+    sign = 1 if search['metric'] == 'loss' else -1
+
+    trials = list(enumerate(make_trials(search, base)))
+    rows = []
+    epochs = min(search['min_epochs'], search['max_epochs'])
+    with ProcessPoolExecutor(search['parallel'], mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        for rung in itertools.count():
+            print(f'round {rung}: {len(trials)} trials, {epochs} epochs')
+            futures = []
+            for i, point in trials:
+                name = search['name'] + '-' + str(i)
+                futures.append(pool.submit(run_trial, trial_config(base, point, name, directory), epochs,
+                                           os.path.join(directory, name + '.pt')))
+            scores = []
+            for (i, point), future in zip(trials, futures):
+                accuracy, loss, seconds = future.result()
+                row = {'trial': i, 'round': rung, 'epochs': epochs}
+                row.update(point)
+                row.update({'val_accuracy': accuracy, 'val_loss': loss, 'seconds': seconds})
+                rows.append(row)
+                scores.append(sign * (loss if search['metric'] == 'loss' else accuracy))
+            write_results(rows, os.path.join(directory, 'results.csv'))
+
+            last_round = sorted(rows[-len(trials):], key=lambda r: sign * r['val_' + search['metric']])
+            if epochs >= search['max_epochs'] or len(trials) == 1:
+                return last_round
+            keep = max(1, math.ceil(len(trials) / search['eta']))
+            trials = [trials[j] for j in sorted(np.argsort(scores, kind='stable')[:keep])]
+            epochs = min(epochs * search['eta'], search['max_epochs'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='parallel hyperparameter search with successive halving')
+    parser.add_argument('--config', required=True,
+                        help='path to a json search config, or the name of one in training/configs/search')
+    parser.add_argument('--parallel', type=int, help='override the number of trials trained at the same time')
+    args = parser.parse_args(argv)
+    search = load_search_config(args.config)
+    if args.parallel is not None:
+        search['parallel'] = args.parallel
+    print_report(run_search(search))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import contextlib
+import torch
+
+# precisions the training step and the inference helpers can run in.  bf16 runs the convs and linear layers with CPU
+# (or CUDA) autocast to bfloat16 while the weights, gradients and optimizer state stay float32
+PRECISIONS = {'fp32': None, 'bf16': torch.bfloat16}
+
+''' returns the autocast context for running a model on device in precision (one of PRECISIONS).  For fp32 it is
+disabled and does nothing'''
+def autocast(device, precision='fp32'):
+    if precision not in PRECISIONS:
+        raise ValueError('unknown precision ' + str(precision) + ', expected one of ' + ', '.join(PRECISIONS))
+    device_type = torch.device(device).type
+    return torch.autocast(device_type, dtype=PRECISIONS[precision] or torch.bfloat16, enabled=precision != 'fp32')
+
+def _untimed(name):
+    return contextlib.nullcontext()
+
+''' passes a batch through the model and returns the loss and the number of correct predictions as tensors on the
+device.  X is a batch of images and y the class numbers (an integer tensor on the same device as X).  If an optimizer
+is given this is a training step: gradients are computed and the optimizer is stepped.  The forward pass and the loss
+run under autocast in the given precision, the backward pass and optimizer step outside it.  timer is an optional
+training.profiling.StepTimer that records the time of the forward, backward and optimizer phases.
+Nothing here waits for the device, the values are only copied to the host when they are converted with float()/int()'''
+def train_step(model, loss_fn, X, y, optimizer=None, precision='fp32', timer=None):
+    phase = timer.phase if timer is not None else _untimed
+    if optimizer is not None:
+        optimizer.zero_grad()
+    with phase('forward'), autocast(X.device, precision):
+        outputs = model(X)
+        loss = loss_fn(outputs, y)
+    if optimizer is not None:
+        with phase('backward'):
+            loss.backward()
+        with phase('optimizer'):
+            optimizer.step()
+    correct = (outputs.argmax(dim=1) == y).sum()
+    return loss.detach(), correct
+
+''' sums loss and accuracy over several batches on the device, so the host only syncs when compute() is called'''
+class MetricAccumulator:
+    def __init__(self, device):
+        self.device = device
+        self.reset()
+
+    def reset(self):
+        self.loss_sum = torch.zeros((), device=self.device)
+        self.correct = torch.zeros((), dtype=torch.long, device=self.device)
+        self.count = 0
+
+    def update(self, loss, correct, n):
+        self.loss_sum += loss * n
+        self.correct += correct
+        self.count += n
+
+    ''' returns the (accuracy, mean loss) of the batches seen since the last reset as floats'''
+    def compute(self):
+        if self.count == 0:
+            return 0.0, 0.0
+        return self.correct.item() / self.count, self.loss_sum.item() / self.count
@@ -0,0 +1,61 @@
+from collections import deque
+import numpy as np
+import torch
+
+''' records the activations of some layers of a model with forward hooks, for viewing with show_activations in
+evaluation_metrics.py.  Only every "every"-th forward pass of the model is recorded and only the last "capacity" records
+per layer are kept, so training can leave it attached without paying a host copy on every batch.
+layers are module names as in model.named_modules() ('conv1', 'conv2' for the CNNs in this repo).  The networks apply
+a ReLU to every conv output inside forward, so relu=True records what the next layer sees (before any max pooling).
+max_items limits how many images of each recorded batch are kept.'''
+class ActivationRecorder:
+    def __init__(self, model, layers=('conv1', 'conv2'), every=100, capacity=8, max_items=None, relu=True):
+        self.layers = list(layers)
+        self.every = every
+        self.max_items = max_items
+        self.relu = relu
+        self.records = {name: deque(maxlen=capacity) for name in self.layers}
+        self._step = 0
+        self._active = False
+
+        modules = dict(model.named_modules())
+        self._handles = [model.register_forward_pre_hook(self._tick)]
+        for name in self.layers:
+            self._handles.append(modules[name].register_forward_hook(self._recorder(name)))
+
+    def _tick(self, module, inputs):
+        self._active = self._step % self.every == 0
+        self._step += 1
+
+    def _recorder(self, name):
+        def hook(module, inputs, output):
+            if not self._active:
+                return
+            out = output.detach()[:self.max_items]
+            if self.relu:
+                out = torch.relu(out)
+            self.records[name].append((self._step - 1, out.float().cpu().numpy()))
+        return hook
+
+    ''' returns the most recent recorded activations of a layer, an array of shape (batch, maps, x, y)'''
+    def latest(self, layer):
+        if not self.records[layer]:
+            raise LookupError('no activations recorded for ' + layer + ' yet')
+        return self.records[layer][-1][1]
+
+    ''' saves the most recent activations of each layer in files, a dictionary of layer name to .npy file name'''
+    def save(self, files):
+        for layer, file in files.items():
+            np.save(file, self.latest(layer))
+
+    ''' detaches the recorder from the model'''
+    def remove(self):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.remove()
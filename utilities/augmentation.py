@@ -0,0 +1,68 @@
+import torch
+from torch.utils.data import get_worker_info
+from torch.utils.data.dataloader import default_collate
+
+from image_processing.noise_processing_tool import GAUSSIAN, SALT_PEPPER, POISSON
+
+# same defaults as skimage.util.random_noise, which apply_noise uses to build the offline noisy datasets
+GAUSSIAN_VAR = 0.01
+SALT_PEPPER_AMOUNT = 0.05
+SALT_VS_PEPPER = 0.5
+POISSON_LEVELS = 256 # random_noise scales by the number of grey levels in the image, 256 for 8 bit images
+
+def gaussian_noise(x, gen):
+    noise = torch.randn(x.shape, generator=gen) * GAUSSIAN_VAR ** 0.5
+    return (x + noise).clamp_(0, 1)
+
+def salt_pepper_noise(x, gen):
+    u = torch.rand(x.shape, generator=gen)
+    out = x.clone()
+    out[u < SALT_PEPPER_AMOUNT * SALT_VS_PEPPER] = 1
+    out[(u >= SALT_PEPPER_AMOUNT * SALT_VS_PEPPER) & (u < SALT_PEPPER_AMOUNT)] = 0
+    return out
+
+def poisson_noise(x, gen):
+    return (torch.poisson(x * POISSON_LEVELS, generator=gen) / POISSON_LEVELS).clamp_(0, 1)
+
+NOISE_FUNCTIONS = {GAUSSIAN: gaussian_noise, SALT_PEPPER: salt_pepper_noise, POISSON: poisson_noise}
+
+''' adds noise to training batches as they are assembled, replacing the offline noisy datasets built with
+preprocess_training_images(noise=True).  Each image gets one of modes picked at random (with probability p, otherwise
+it is left clean) and the noise is drawn for the whole batch at once.
+Pass an instance as the collate_fn of a DataLoader (make_loader(..., augment=NoiseAugmenter())) so the noise is added
+in the loader workers.  Each worker draws from its own generator seeded from the DataLoader's per worker seed, so runs
+are reproducible under torch.manual_seed and every epoch sees fresh noise.
+Note that unlike apply_noise the noise is added to the preprocessed images rather than to the raw images.'''
+class NoiseAugmenter:
+    def __init__(self, modes=(GAUSSIAN, SALT_PEPPER, POISSON), p=1.0, seed=0):
+        self.modes = list(modes)
+        self.p = p
+        self.seed = seed
+        self._gen = None
+        self._gen_key = None
+
+    def __call__(self, batch):
+        x, y = default_collate(batch)
+        return self.apply(x), y
+
+    def _generator(self):
+        info = get_worker_info()
+        key = None if info is None else (info.id, info.seed)
+        if self._gen is None or self._gen_key != key:
+            self._gen = torch.Generator()
+            self._gen.manual_seed(self.seed if info is None else info.seed)
+            self._gen_key = key
+        return self._gen
+
+    ''' returns a noisy copy of a batch of images with values between 0 and 1'''
+    def apply(self, x):
+        gen = self._generator()
+        n = len(x)
+        mode = torch.randint(len(self.modes), (n,), generator=gen)
+        noisy = torch.rand(n, generator=gen) < self.p
+        out = x.clone()
+        for m, name in enumerate(self.modes):
+            selected = noisy & (mode == m)
+            if selected.any():
+                out[selected] = NOISE_FUNCTIONS[name](x[selected], gen)
+        return out
@@ -3,8 +3,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image
 from image_processing.angels_image_processing_tool import process_image
+from utilities.labels import to_classes, one_hot, class_histogram
+from utilities.shuffling import COPY_CHUNK
 import random
-import copy
 
 ''' checks the dataset is balanced, prints out the input dictionary updated with the total amount of each class
 in the training set.
@@ -12,16 +13,19 @@ Input:
 dict(dictionary): initialized with all of the classes with their total count set to 0. ex. class:0
 labels(numpy array):  array containing all the labels of the training set instances'''
 def check_balance(dict, labels):
-    total = 0
-    for y in labels:
-        dict[int(y)] += 1
-        total += 1
+    counts = class_histogram(labels, len(dict))
+    for k in dict:
+        dict[k] += int(counts[k])
     print(dict)
 
 '''given an image path, the function returns a numpy array of the image with gaussian blur technique, greyscaled, 
 centered around the mean pixel value and normalized pixel values between 0-1 
 0 and 1'''
 def preprocess_image(image):
+    return normalize_image(process_raw_image(image))
+
+'''given an image path or array, returns the greyscaled, blurred and sharpened image before normalization'''
+def process_raw_image(image):
     try:
         _, _, color = np.asarray(Image.open(image)).shape
     except AttributeError:
@@ -42,10 +46,12 @@ def preprocess_image(image):
         else:
             img = Image.fromarray(image)
 
-    #gaussian blur and sharpen edges then flatten image
-    img = process_image(img)
-    x, y = img.shape
+    #gaussian blur and sharpen edges
+    return process_image(img)
 
+'''centers an image around its mean pixel value and min-max scales it so pixel values are between 0 and 1'''
+def normalize_image(img):
+    x, y = img.shape
     img = np.ravel(img)
 
     # center data around the mean
@@ -58,22 +64,33 @@ def preprocess_image(image):
 
     return img.reshape(x, y)
 
+'''pads a preprocessed image with zeros (or fill) on the top and left so that it is size x size pixels'''
+def pad_image(px, size=200, fill=0):
+    row, col = px.shape
+    if row == size and col == size:
+        return px
+    padded = np.full((size, size), fill, dtype=px.dtype)
+    padded[size - row:, size - col:] = px
+    return padded
+
+'''fits a preprocessed image into size x size pixels: images bigger than that are scaled down (keeping their aspect
+ratio) until they fit, then the image is padded like pad_image'''
+def fit_image(px, size=200, fill=0):
+    row, col = px.shape
+    if row > size or col > size:
+        scale = size / max(row, col)
+        shape = (max(1, min(size, round(col * scale))), max(1, min(size, round(row * scale))))
+        px = np.asarray(Image.fromarray(px.astype(np.float32)).resize(shape, Image.BILINEAR))
+    return pad_image(px, size, fill)
+
 '''reformat y to one-hot-vector-format'''
 def one_hot_vector(y, num_classes):
-    reformat_y = np.zeros((len(y), num_classes)).astype(int)
-    j = 0
-    while j < len(y):
-        reformat_y[j][y[j]] = 1
-        j += 1
-    return reformat_y
+    return one_hot(y, num_classes)
 
 
-''' turns one-hot-vector into numberic label'''
+''' turns one-hot-vector into numberic label, labels that are already class numbers are returned as ints'''
 def numeric_class(y):
-    arr = np.empty(0)
-    for i in y:
-        arr = np.append(arr, np.argmax(i)).astype(int)
-    return arr
+    return to_classes(y, int)
 
 ''' check if file exists and returns loaded numpy array if it does, otherwise it returns an empty array'''
 def get_training_arr(file):
@@ -85,31 +102,25 @@ def get_training_arr(file):
         return np.load(file, allow_pickle=True)
 
 ''' shuffles dataset before use.  Classes is the number of outcomes possible in the classification of the set and 
-num_samples is the number of images in the set'''
+num_samples is the number of images in the set.  Features and labels are shuffled with the same index permutation, so
+labels keep their type.  For files that do not fit in memory use shuffle_file or external_shuffle in shuffling.py'''
 
 def shuffle_set(X, y, classes, num_samples):
-    X = X.reshape(num_samples, -1)
-    y = numeric_class(y).reshape(-1, 1)
-    xy = np.hstack((X, y))
-    np.random.shuffle(xy)
-    X, y = xy[:, :40000].reshape(-1, 200, 200), xy[:, -1]
-    y = one_hot_vector(y.astype(int), num_classes=classes)
-    return X, y
+    perm = np.random.permutation(num_samples)
+    X = X.reshape(num_samples, 200, 200)[perm]
+    return X, np.asarray(y)[perm]
 
 '''Adding noise to the images over such a large dataset caused memory problems (too large for RAM).  This methon does an
-inplace swap of two seperate datasets so that samples are adequately shuffled before use.'''
+inplace swap of two seperate datasets so that samples are adequately shuffled before use.  The rows are swapped
+COPY_CHUNK at a time so it also works on memory mapped arrays; external_shuffle in shuffling.py does a full shuffle of
+datasets split over several files'''
 def swap(feat_X1, label_y1, feat_X2, label_y2):
-    arr_len, _ = label_y1.shape
+    arr_len = len(label_y1)
     rand_len = int(arr_len / 2)
-    rand = random.sample(range(arr_len), rand_len)
-    for i in rand:
-        lab_temp = copy.deepcopy(label_y1[i, :])
-        feat_temp = copy.deepcopy(feat_X1[i, :, :])
-        label_y1[i, :] = label_y2[i, :]
-        feat_X1[i, :, :] = feat_X2[i, :, :]
-        label_y2[i, :] = lab_temp
-        feat_X2[i, :, :] = feat_temp
+    rand = np.sort(random.sample(range(arr_len), rand_len))
+    for i in range(0, rand_len, COPY_CHUNK):
+        idx = rand[i:i + COPY_CHUNK]
+        # fancy indexing returns copies, so the right hand side is read before either array is written
+        label_y1[idx], label_y2[idx] = label_y2[idx], label_y1[idx]
+        feat_X1[idx], feat_X2[idx] = feat_X2[idx], feat_X1[idx]
     return feat_X1, label_y1, feat_X2, label_y2
-
-
-
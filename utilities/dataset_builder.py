@@ -0,0 +1,91 @@
+import os
+import multiprocessing
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from utilities.data_processing import process_raw_image
+from utilities.feature_store import encode_image, FEATURE_DTYPES, FLOAT64, IMG_SIZE
+from utilities.shuffling import COPY_CHUNK
+from image_processing.noise_processing_tool import apply_noise
+
+SHARD_SIZE = 256 # number of images handed to a worker process at a time in parallel builds
+
+''' returns the paths of every image found under basedir + d for each d in dirs.  The order is deterministic (class
+folders in the order given, file names sorted) so that labels built from the class counts line up with the features'''
+def list_image_files(basedir, dirs):
+    paths = []
+    for d in dirs:
+        for root, _, files in sorted(os.walk(basedir + d)):
+            for name in sorted(files):
+                paths.append(os.path.join(root, name))
+    return paths
+
+''' loads, (optionally) adds noise, preprocesses and pads a single image so it is ready to be stored in a feature file
+of the given dtype (see utilities/feature_store.py).  If a PreprocessCache is given, the result is read from / saved to
+the cache'''
+def load_training_image(path, noise=False, cache=None, dtype=FLOAT64):
+    if cache is not None:
+        return cache.load(path, lambda p: load_training_image(p, noise, dtype=dtype))
+    if noise:
+        raw = process_raw_image(apply_noise(path))
+    else:
+        raw = process_raw_image(path)
+    return encode_image(raw, dtype)
+
+''' preallocates a feature file on disk big enough for num_images images of IMG_SIZE x IMG_SIZE.  If append is True and
+fname already exists, its images are copied to the start of the new file.  The array is written to a temporary file that
+finalize_feature_file moves over fname, so a build that is interrupted never leaves a truncated fname behind.
+Returns the memory mapped array and the index of the first free slot'''
+def open_feature_file(fname, num_images, append=True, dtype=FLOAT64):
+    existing = None
+    if append and os.path.exists(fname):
+        existing = np.load(fname, mmap_mode='r')
+        if existing.dtype != FEATURE_DTYPES[dtype]:
+            raise ValueError(fname + ' is stored as ' + str(existing.dtype) + ', cannot append ' + dtype + ' images')
+    offset = 0 if existing is None else len(existing)
+
+    out = open_memmap(fname + '.partial', mode='w+', dtype=FEATURE_DTYPES[dtype], shape=(offset + num_images, IMG_SIZE, IMG_SIZE))
+    for i in range(0, offset, COPY_CHUNK):
+        out[i:i + COPY_CHUNK] = existing[i:i + COPY_CHUNK]
+    return out, offset
+
+''' flushes a feature file opened with open_feature_file and moves it into place'''
+def finalize_feature_file(out, fname):
+    out.flush()
+    os.replace(fname + '.partial', fname)
+
+''' worker task for parallel builds: preprocesses the images of one shard and writes them straight into their slots of
+the partially built feature file, so no image arrays are pickled back to the parent process'''
+def _build_shard(task):
+    partial_fname, start, paths, noise, cache, dtype = task
+    out = np.load(partial_fname, mmap_mode='r+')
+    for i, path in enumerate(paths):
+        out[start + i] = load_training_image(path, noise, cache, dtype)
+    out.flush()
+    return len(paths)
+
+''' preprocesses every image in paths and writes it into its own slot of a preallocated memory mapped .npy file.  Build
+time is linear in the number of images and memory use does not grow with the size of the dataset.
+workers > 1 shards the file list across a process pool.  Every image still lands in the slot given by its position in
+paths, so the output order (and therefore the label alignment) is the same as a serial build.
+cache is an optional PreprocessCache (created with size=IMG_SIZE and the same dtype) so that only new or changed images
+are preprocessed. dtype selects the storage format, see utilities/feature_store.py'''
+def build_feature_file(paths, fname, noise=False, append=True, workers=1, cache=None, dtype=FLOAT64):
+    if not paths:
+        return
+    out, offset = open_feature_file(fname, len(paths), append=append, dtype=dtype)
+    if workers > 1:
+        out.flush()
+        tasks = [(fname + '.partial', offset + i, paths[i:i + SHARD_SIZE], noise, cache, dtype)
+                 for i in range(0, len(paths), SHARD_SIZE)]
+        done = 0
+        with multiprocessing.Pool(workers) as pool:
+            for n in pool.imap_unordered(_build_shard, tasks):
+                done += n
+                print(str(done) + '/' + str(len(paths)))
+    else:
+        for i, path in enumerate(paths):
+            print(os.path.basename(path))
+            out[offset + i] = load_training_image(path, noise, cache, dtype)
+    print(out.shape)
+    finalize_feature_file(out, fname)
@@ -0,0 +1,61 @@
+import numpy as np
+import torch
+from torch.utils.data import Dataset, DataLoader
+
+from utilities.feature_store import open_features, normalize_batch
+from utilities.labels import to_classes
+
+# default DataLoader settings for training.  Worker processes read and normalize the next batches from the memory
+# mapped feature files while the model is busy with the current one
+LOADER_WORKERS = 2
+PREFETCH_FACTOR = 4
+
+''' dataset over a feature file (any format from utilities/feature_store.py) and its label file.  The features are memory
+mapped and read one image at a time, so the dataset never has to fit in memory.  start and stop select a contiguous
+range of the files, for example to split off a validation set.
+Items are (1 x 200 x 200 float32 tensor, class number)'''
+class FeatureDataset(Dataset):
+    def __init__(self, features_file, labels_file, start=0, stop=None):
+        self.features_file = features_file
+        self.start = start
+        self.labels = to_classes(np.load(labels_file, mmap_mode='r')[start:stop], np.int64)
+        self._features = None
+
+    # the memory map is opened on first use so every DataLoader worker opens its own
+    @property
+    def features(self):
+        if self._features is None:
+            self._features = open_features(self.features_file)
+        return self._features
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_features'] = None
+        return state
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        x = normalize_batch(self.features[self.start + i][None])
+        return torch.from_numpy(x), int(self.labels[i])
+
+    ''' reads the contiguous range [start, stop) of the dataset in one go, returns (n x 1 x 200 x 200, n) tensors'''
+    def get_batch(self, start, stop):
+        x = normalize_batch(self.features[self.start + start:self.start + stop])
+        return torch.from_numpy(x).unsqueeze(1), torch.from_numpy(self.labels[start:stop])
+
+''' returns a DataLoader over dataset that assembles batches in worker processes, prefetching prefetch_factor batches
+per worker and (when training on the GPU) copying them into pinned memory so the host to device copy can overlap with
+the computation.  augment is an optional NoiseAugmenter from utilities/augmentation.py applied to every batch'''
+def make_loader(dataset, batch_size, shuffle=False, workers=LOADER_WORKERS, prefetch_factor=PREFETCH_FACTOR,
+                pin_memory=None, augment=None, **kwargs):
+    if augment is not None:
+        kwargs['collate_fn'] = augment
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    if workers > 0:
+        kwargs['prefetch_factor'] = prefetch_factor
+        kwargs['persistent_workers'] = True
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=workers, pin_memory=pin_memory,
+                      **kwargs)
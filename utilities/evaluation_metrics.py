@@ -5,9 +5,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 import constants as c
+from utilities.activation_capture import ActivationRecorder
 
-def show_activations(file, batch_no, row, col):
-    activations = np.load(file, allow_pickle=True)
+''' plots the feature maps of one image of a recorded batch of activations.  source is either a .npy file saved by
+ActivationRecorder.save or an ActivationRecorder, in which case layer selects the layer to plot'''
+def show_activations(source, batch_no, row, col, layer='conv1'):
+    if isinstance(source, ActivationRecorder):
+        activations = source.latest(layer)
+    else:
+        activations = np.load(source, allow_pickle=True)
     maps, x, y = activations[batch_no, :, :, :].shape
 
     plt.figure(figsize=(row*2, col*2))
@@ -16,5 +22,6 @@ def show_activations(file, batch_no, row, col):
         plt.imshow(activations[batch_no, m, :, :], cmap='summer', interpolation='nearest')
     plt.show()
 
-show_activations(c.ACTIVATION_LYR_1, 2, 4, 4)
-show_activations(c.ACTIVATION_LYR_2, 2, 4, 6)
+if __name__ == '__main__':
+    show_activations(c.ACTIVATION_LYR_1, 2, 4, 4)
+    show_activations(c.ACTIVATION_LYR_2, 2, 4, 6)
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import torch
+
+from utilities.data_processing import normalize_image, pad_image
+
+IMG_SIZE = 200
+READ_CHUNK = 1000 # number of images normalized at a time when a whole feature file is read
+
+# storage formats for preprocessed feature files.
+# FLOAT64: normalized images, the original format (320 KB per 200x200 image)
+# FLOAT16: blurred/sharpened images before normalization (80 KB per image), normalized when read
+# UINT8: normalized images quantized to 0-255 (40 KB per image), rescaled to 0-1 when read
+FLOAT64 = 'float64'
+FLOAT16 = 'float16'
+UINT8 = 'uint8'
+FEATURE_DTYPES = {FLOAT64: np.float64, FLOAT16: np.float16, UINT8: np.uint8}
+
+''' converts the output of process_raw_image (not yet normalized, any size up to IMG_SIZE) to a padded image in the given
+storage format'''
+def encode_image(raw, dtype=FLOAT64):
+    if dtype == FLOAT16:
+        # pad with the minimum so the padding becomes 0 when the image is normalized on load
+        return pad_image(raw, IMG_SIZE, fill=np.amin(raw)).astype(np.float16)
+    px = pad_image(normalize_image(raw), IMG_SIZE)
+    if dtype == UINT8:
+        return np.rint(px * 255).astype(np.uint8)
+    if dtype == FLOAT64:
+        return px
+    raise ValueError('unknown feature dtype: ' + str(dtype))
+
+''' applies the per image normalization from preprocess_image to a batch of stored images of shape (n, x, y) and returns
+them as float32.  Centering around the mean cancels out under min-max scaling, so only the min-max step is computed.
+Files in any of the storage formats (including the original float64 files, which are already normalized) come out
+the same'''
+def normalize_batch(batch):
+    batch = np.asarray(batch, dtype=np.float32)
+    n = len(batch)
+    flat = batch.reshape(n, -1)
+    lo = flat.min(axis=1)
+    span = flat.max(axis=1) - lo
+    span[span == 0] = 1 # blank images would otherwise divide by zero
+    out = (flat - lo[:, None]) / span[:, None]
+    return out.reshape(batch.shape)
+
+''' opens a feature file without reading it into memory'''
+def open_features(file):
+    return np.load(file, mmap_mode='r')
+
+''' reads images index (an int, slice or array of indices) from an open feature file and returns them normalized as a
+float32 tensor'''
+def read_tensor(features, index):
+    batch = features[index]
+    if batch.ndim == 2:
+        return torch.from_numpy(normalize_batch(batch[None])[0])
+    return torch.from_numpy(normalize_batch(batch))
+
+''' loads a whole feature file in any storage format as a normalized float32 array.  Like get_training_arr, returns an
+empty array if the file does not exist'''
+def get_feature_arr(file):
+    if not os.path.exists(file):
+        return np.empty((0, IMG_SIZE, IMG_SIZE), dtype=np.float32)
+    features = open_features(file)
+    out = np.empty(features.shape, dtype=np.float32)
+    for i in range(0, len(features), READ_CHUNK):
+        out[i:i + READ_CHUNK] = normalize_batch(features[i:i + READ_CHUNK])
+    return out
+
+''' rewrites an existing feature file (for example one of the float64 files) in a compact storage format'''
+def convert_feature_file(src, dst, dtype=UINT8):
+    features = open_features(src)
+    out = np.lib.format.open_memmap(dst + '.partial', mode='w+', dtype=FEATURE_DTYPES[dtype], shape=features.shape)
+    for i in range(0, len(features), READ_CHUNK):
+        batch = np.asarray(features[i:i + READ_CHUNK], dtype=np.float64)
+        if dtype == UINT8:
+            batch = np.rint(normalize_batch(batch) * 255)
+        out[i:i + READ_CHUNK] = batch
+    out.flush()
+    os.replace(dst + '.partial', dst)
@@ -0,0 +1,31 @@
+import numpy as np
+
+# labels are stored as one byte class numbers (the alphabet has 26 classes, the digits 10) instead of one-hot-vectors
+LABEL_DTYPE = np.uint8
+
+# one-vs-rest labels follow the convention of the one-vs-rest models: 0 is the class, 1 is the rest
+ONE = 0
+REST = 1
+
+''' returns labels given as one-hot-vectors (n x classes) or class numbers (n) as an array of class numbers'''
+def to_classes(y, dtype=LABEL_DTYPE):
+    y = np.asarray(y)
+    if y.ndim == 2:
+        return np.argmax(y, axis=1).astype(dtype)
+    return y.astype(dtype)
+
+''' returns class numbers as an n x num_classes array of one-hot-vectors'''
+def one_hot(classes, num_classes, dtype=int):
+    return np.eye(num_classes, dtype=dtype)[to_classes(classes, np.intp)]
+
+''' maps labels to one-vs-rest class numbers, ONE where the label is positive and REST everywhere else'''
+def one_vs_rest(y, positive):
+    return np.where(to_classes(y) == positive, ONE, REST).astype(LABEL_DTYPE)
+
+''' returns the number of instances of each class'''
+def class_histogram(y, num_classes):
+    return np.bincount(to_classes(y, np.intp), minlength=num_classes)
+
+''' builds the labels of a dataset whose images are grouped by class, counts[i] being the number of images of class i'''
+def make_class_labels(counts):
+    return np.repeat(np.arange(len(counts)), counts).astype(LABEL_DTYPE)
@@ -0,0 +1,73 @@
+import argparse
+import time
+import numpy as np
+import torch
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import constants as c
+from models.checkpoint import load_model
+from training.step import autocast, PRECISIONS
+from utilities.datasets import FeatureDataset
+
+# the trained models compared by default, as (checkpoint, features file, labels file).  The data is the noiseless
+# validation data the test scripts use
+MODELS = {
+    'alphabet': ('alphabet_model.pt', 'alpha_validate_features_no_noise.npy', 'alpha_validate_labels_no_noise.npy'),
+    'digit': ('digit_model.pt', 'digit_features_shuffled_no_noise.npy', 'digit_labels_shuffled_no_noise.npy'),
+}
+BATCH_SIZE = 100
+
+''' runs the model over the first size samples of dataset in precision, returns the predicted probabilities
+(size x classes float32 array) and the time spent in the model'''
+def predict(model, dataset, precision, size, batch_size=BATCH_SIZE):
+    outputs = []
+    elapsed = 0.0
+    with torch.no_grad():
+        for start in range(0, size, batch_size):
+            X, _ = dataset.get_batch(start, min(start + batch_size, size))
+            init_time = time.perf_counter()
+            with autocast('cpu', precision):
+                out = model(X)
+            elapsed += time.perf_counter() - init_time
+            outputs.append(out.float().numpy())
+    return np.concatenate(outputs), elapsed
+
+''' compares fp32 and bf16 inference of one of the MODELS: accuracy of both, how many predictions changed, the largest
+change of a predicted probability and the throughput of both'''
+def compare(name, size=1000, batch_size=BATCH_SIZE):
+    checkpoint, features, labels = MODELS[name]
+    model = load_model(os.path.join(c.MODEL_SAVE_PATH, checkpoint))
+    dataset = FeatureDataset(features, labels)
+    size = min(size, len(dataset))
+    y = dataset.labels[:size]
+
+    probs, times = {}, {}
+    for precision in PRECISIONS:
+        probs[precision], times[precision] = predict(model, dataset, precision, size, batch_size)
+    fp32, bf16 = probs['fp32'], probs['bf16']
+    return {
+        'model': name,
+        'samples': size,
+        'fp32_accuracy': float(np.mean(fp32.argmax(1) == y)),
+        'bf16_accuracy': float(np.mean(bf16.argmax(1) == y)),
+        'changed_predictions': int(np.sum(fp32.argmax(1) != bf16.argmax(1))),
+        'max_prob_diff': float(np.abs(fp32 - bf16).max()),
+        'fp32_images_per_s': size / times['fp32'],
+        'bf16_images_per_s': size / times['bf16'],
+    }
+
+def print_report(rows):
+    columns = list(rows[0])
+    print(', '.join(columns))
+    for row in rows:
+        print(', '.join(str(round(row[k], 5)) if isinstance(row[k], float) else str(row[k]) for k in columns))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compare the accuracy and speed of fp32 and bf16 inference')
+    parser.add_argument('models', nargs='*', default=list(MODELS), help='models to compare (default: all)')
+    parser.add_argument('--size', type=int, default=1000, help='number of validation samples to use')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    print_report([compare(name, args.size, args.batch_size) for name in args.models])
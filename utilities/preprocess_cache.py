@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+from image_processing.angels_image_processing_tool import BLUR_KERNEL, OPENING_KERNEL, SHARPEN_KERNEL
+import constants as c
+
+CACHE_VERSION = 1 # bump when preprocess_image changes in a way the kernel constants do not capture
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+EVICT_TO = 0.9 # eviction frees space down to this fraction of max_bytes so it does not run again on the next put
+
+''' returns a short hash of everything that determines the output of the preprocessing pipeline.  noise is the noise
+mode applied before preprocessing (False when no noise is applied), size is the size images are padded to, or None
+when images are left at their preprocessed size, and dtype is the feature storage format (None for unencoded images)'''
+def pipeline_fingerprint(noise=False, size=None, dtype=None):
+    params = {'version': CACHE_VERSION, 'blur': BLUR_KERNEL, 'opening': OPENING_KERNEL, 'sharpen': SHARPEN_KERNEL,
+              'noise': noise, 'size': size, 'dtype': dtype}
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+''' returns the sha1 of the contents of the file at path'''
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+''' persistent cache of preprocessed images.  Entries are keyed on the content hash of the source image plus the
+pipeline fingerprint, so renaming or moving a file still hits while editing an image or changing a kernel misses.
+When the cache grows past max_bytes the least recently used entries are evicted.
+Note that with noise enabled the cached array holds one fixed noise draw per image.'''
+class PreprocessCache:
+    def __init__(self, cache_dir=c.PREPROCESS_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, noise=False, size=None,
+                 dtype=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = pipeline_fingerprint(noise, size, dtype)
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.npy')
+
+    def key(self, path):
+        return file_digest(path) + '-' + self.fingerprint
+
+    ''' returns the cached array for the image at path, or None if it has not been cached'''
+    def get(self, path):
+        return self._get(self.key(path))
+
+    ''' stores px as the preprocessed version of the image at path'''
+    def put(self, path, px):
+        self._put(self.key(path), px)
+
+    ''' returns the cached array for the image at path, calling preprocess(path) and caching its result on a miss'''
+    def load(self, path, preprocess):
+        key = self.key(path)
+        px = self._get(key)
+        if px is not None:
+            self.hits += 1
+            return px
+        self.misses += 1
+        px = preprocess(path)
+        self._put(key, px)
+        return px
+
+    def _get(self, key):
+        entry = self._entry_path(key)
+        try:
+            px = np.load(entry)
+            os.utime(entry) # mark as recently used
+        except (OSError, ValueError):
+            return None # missing, evicted by another process or unreadable
+        return px
+
+    def _put(self, key, px):
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # write then rename so that other processes never read a partially written entry
+        tmp = entry + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, px)
+        os.replace(tmp, entry)
+
+        if self._size is None:
+            self._size = self.disk_usage()
+        else:
+            self._size += os.path.getsize(entry)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.npy'):
+                    yield os.path.join(root, name)
+
+    def disk_usage(self):
+        return sum(os.path.getsize(entry) for entry in self._entries())
+
+    ''' deletes least recently used entries until the cache is at most EVICT_TO * max_bytes'''
+    def evict(self):
+        entries = []
+        for entry in self._entries():
+            stat = os.stat(entry)
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        for _, size, entry in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass # already evicted by another process
+            total -= size
+        self._size = total
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+
+COPY_CHUNK = 1000 # number of rows (images and labels) copied or moved at a time on memory mapped arrays
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3 # bytes of features held in memory at once by external_shuffle
+
+''' writes features[perm] and labels[perm] to new .npy files.  features can be a memory mapped array much larger than
+RAM: the output is written sequentially in chunks and the rows of each chunk are read in increasing file order'''
+def permute_to_file(features, labels, perm, out_features, out_labels):
+    out_X = open_memmap(out_features + '.partial', mode='w+', dtype=features.dtype,
+                        shape=(len(perm),) + features.shape[1:])
+    out_y = open_memmap(out_labels + '.partial', mode='w+', dtype=labels.dtype, shape=(len(perm),) + labels.shape[1:])
+    for i in range(0, len(perm), COPY_CHUNK):
+        idx = perm[i:i + COPY_CHUNK]
+        order = np.argsort(idx)
+        block = np.empty((len(idx),) + features.shape[1:], dtype=features.dtype)
+        block[order] = features[idx[order]]
+        out_X[i:i + len(idx)] = block
+        out_y[i:i + len(idx)] = labels[idx]
+    _finalize(out_X, out_features)
+    _finalize(out_y, out_labels)
+
+''' shuffles the rows of a feature file and its label file into new files using an index permutation'''
+def shuffle_file(features_file, labels_file, out_features, out_labels, seed=None):
+    features = np.load(features_file, mmap_mode='r')
+    labels = np.load(labels_file, mmap_mode='r')
+    perm = np.random.RandomState(seed).permutation(len(labels))
+    permute_to_file(features, labels, perm, out_features, out_labels)
+
+def _finalize(out, fname):
+    out.flush()
+    os.replace(fname + '.partial', fname)
+
+''' several same shaped arrays (e.g. the memory maps of a dataset split over more than one file) addressed as if they
+were one array'''
+class _Shards:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.offsets = np.cumsum([0] + [len(a) for a in arrays])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _pieces(self, start, stop):
+        for a, lo, hi in zip(self.arrays, self.offsets[:-1], self.offsets[1:]):
+            s, e = max(start, lo), min(stop, hi)
+            if s < e:
+                yield a, s - lo, e - lo, s - start
+
+    def read(self, start, stop):
+        return np.concatenate([a[s:e] for a, s, e, _ in self._pieces(start, stop)])
+
+    def write(self, start, block):
+        for a, s, e, pos in self._pieces(start, start + len(block)):
+            a[s:e] = block[pos:pos + e - s]
+
+''' uniformly shuffles a dataset that does not fit in memory, replacing swap().  sources is a list of
+(features_file, labels_file) pairs that are shuffled together as one dataset, and outputs is a list of
+(features_file, labels_file) pairs to write the result to (by default one file pair with all the rows).  Output files
+are filled in order, each taking as many rows as its sizes entry (by default the sizes of the sources).
+
+This is a two pass bucket shuffle.  Every row is assigned a random bucket small enough to fit in memory_budget bytes,
+then the sources are read sequentially and each row is appended to its bucket's region of the output.  In the second
+pass each bucket is loaded, shuffled in memory and written back.  Both passes read and write in large contiguous chunks,
+so the cost is a couple of sequential passes over the data'''
+def external_shuffle(sources, outputs=None, sizes=None, memory_budget=DEFAULT_MEMORY_BUDGET, seed=None):
+    rng = np.random.RandomState(seed)
+    src_X = _Shards([np.load(f, mmap_mode='r') for f, _ in sources])
+    src_y = _Shards([np.load(l, mmap_mode='r') for _, l in sources])
+    n = len(src_X)
+    first_X, first_y = src_X.arrays[0], src_y.arrays[0]
+
+    if outputs is None:
+        outputs = [(sources[0][0][:-len('.npy')] + '_shuffled.npy', sources[0][1][:-len('.npy')] + '_shuffled.npy')]
+        sizes = [n]
+    if sizes is None:
+        sizes = [len(a) for a in src_X.arrays]
+    if len(sizes) != len(outputs):
+        raise ValueError('got ' + str(len(outputs)) + ' outputs but ' + str(len(sizes)) + ' sizes')
+    if sum(sizes) != n:
+        raise ValueError('output sizes add up to ' + str(sum(sizes)) + ' rows, the sources have ' + str(n))
+    out_X = _Shards([open_memmap(f + '.partial', mode='w+', dtype=first_X.dtype, shape=(size,) + first_X.shape[1:])
+                     for (f, _), size in zip(outputs, sizes)])
+    out_y = _Shards([open_memmap(l + '.partial', mode='w+', dtype=first_y.dtype, shape=(size,) + first_y.shape[1:])
+                     for (_, l), size in zip(outputs, sizes)])
+
+    # pass 1: scatter rows into random buckets, each bucket is a contiguous region of the output
+    row_bytes = first_X[0].nbytes + first_y[0].nbytes
+    # a bucket is held in memory twice in pass 2 (as read and permuted)
+    num_buckets = max(1, int(np.ceil(2 * n * row_bytes / memory_budget)))
+    bucket = rng.randint(num_buckets, size=n)
+    cursor = np.concatenate(([0], np.cumsum(np.bincount(bucket, minlength=num_buckets))))
+    bounds = cursor.copy()
+    for i in range(0, n, COPY_CHUNK):
+        X, y = src_X.read(i, min(i + COPY_CHUNK, n)), src_y.read(i, min(i + COPY_CHUNK, n))
+        b = bucket[i:i + COPY_CHUNK]
+        for k in np.unique(b):
+            rows = b == k
+            out_X.write(cursor[k], X[rows])
+            out_y.write(cursor[k], y[rows])
+            cursor[k] += np.count_nonzero(rows)
+
+    # pass 2: shuffle each bucket in memory
+    for k in range(num_buckets):
+        lo, hi = bounds[k], bounds[k + 1]
+        if hi - lo < 2:
+            continue
+        perm = rng.permutation(hi - lo)
+        out_X.write(lo, out_X.read(lo, hi)[perm])
+        out_y.write(lo, out_y.read(lo, hi)[perm])
+
+    for (f, l), X, y in zip(outputs, out_X.arrays, out_y.arrays):
+        _finalize(X, f)
+        _finalize(y, l)
+    return outputs
@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+from collections import deque
+import numpy as np
+
+from utilities.data_processing import fit_image, preprocess_image
+from utilities.dataset_builder import list_image_files
+
+BATCH_SIZE = 64 # images per inference batch
+CHUNK_SIZE = 8 # images handed to a worker process at a time
+MAX_PENDING = 4 * BATCH_SIZE # preprocessed images waiting for a batch before the fullest one is flushed
+
+''' returns (path, class) for every image of the team dataset under basedir + cls for each of classes, in the same
+deterministic order as the feature file builds'''
+def list_team_images(basedir, classes):
+    return [(path, cls) for cls in classes for path in list_image_files(basedir, [cls])]
+
+''' worker task: loads and preprocesses a chunk of team images (through the PreprocessCache if there is one) and, with
+pad_to, fits them into pad_to x pad_to (see fit_image)'''
+def _load_team_images(tasks):
+    images = []
+    for path, cls, cache, pad_to in tasks:
+        px = preprocess_image(path) if cache is None else cache.load(path, preprocess_image)
+        if pad_to is not None:
+            px = fit_image(px, pad_to)
+        images.append((px.astype(np.float32), cls))
+    return images
+
+''' yields (images, classes) batches of the team dataset under basedir (one folder per class) ready for batched
+inference.  The images are decoded and preprocessed by a pool of worker processes and grouped into batches of up to
+batch_size images of the same shape.  A batch is handed out as soon as it is full, or when max_pending images are
+waiting (then the fullest batch goes out), and only a few chunks of images per worker are being prepared at a time, so
+memory stays bounded and the workers prepare the next images while the caller runs the model on the current batch.
+The team photos all have different sizes, so only pad_to (e.g. the input size of the model) really batches them: every
+image is scaled down if needed and padded to pad_to x pad_to like the training feature files.  Without it images are
+kept at their own size and almost every batch holds a single image, but the predictions are the same as predicting
+every image on its own.  Batches come out in no particular order, with the class of every image'''
+def team_batches(basedir, classes, cache=None, workers=None, batch_size=BATCH_SIZE, pad_to=None,
+                 max_pending=MAX_PENDING):
+    tasks = [(path, cls, cache, pad_to) for path, cls in list_team_images(basedir, classes)]
+    chunks = deque(tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE))
+    workers = workers or os.cpu_count()
+    buckets = {}
+    pending = 0
+    with multiprocessing.Pool(workers) as pool:
+        # two chunks per worker keep every worker busy while the oldest results are collected
+        in_flight = deque(pool.apply_async(_load_team_images, (chunks.popleft(),))
+                          for _ in range(min(2 * workers, len(chunks))))
+        while in_flight:
+            results = in_flight.popleft().get()
+            if chunks:
+                in_flight.append(pool.apply_async(_load_team_images, (chunks.popleft(),)))
+            for px, cls in results:
+                images, labels = buckets.setdefault(px.shape, ([], []))
+                images.append(px)
+                labels.append(cls)
+                pending += 1
+                if len(images) == batch_size:
+                    del buckets[px.shape]
+                    pending -= len(images)
+                    yield np.stack(images), labels
+            while pending > max_pending:
+                images, labels = buckets.pop(max(buckets, key=lambda shape: len(buckets[shape][0])))
+                pending -= len(images)
+                yield np.stack(images), labels
+    for images, labels in buckets.values():
+        yield np.stack(images), labels